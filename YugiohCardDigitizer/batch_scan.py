@@ -0,0 +1,210 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines a batch entry point that scans a whole folder (or glob) of card images at once by
+#                         spreading them across a pool of worker processes and streaming the results back as JSONL
+#######################################################################################################################
+# Example usage: python batch_scan.py samples/ --output results.jsonl
+#                python batch_scan.py binder_pages/ --binder      (each photo holds several cards, e.g. a 9-pocket page)
+#                python batch_scan.py samples/ --adaptive         (cheap low resolution OCR first, full size if unsure)
+
+# imports
+import argparse                                                 # for parsing command line arguments
+import glob                                                     # for expanding wildcard patterns like "binder/*.jpg"
+import json                                                     # for writing each result as a line of JSON
+import os                                                       # for file operations and counting cpu cores
+import sys                                                      # for writing to standard output
+import time                                                     # for timing how long each card takes
+from concurrent.futures import ProcessPoolExecutor, as_completed  # for running scans on every core of the machine
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from tesseract import process_yugioh_card, region_passes       # for ocr image processing
+from YugiohCardDigitizer.utils.tracing import start_trace
+from YugiohCardDigitizer.preprocessing.card_detector import detect_cards
+
+# defines what image extensions are picked up when a directory is supplied
+IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
+
+#######################################################################################################################
+# Function that works out how many worker processes the machine can keep busy
+# Parameters: none
+# Returns: the number of cpu cores available to this process (at least 1)
+#######################################################################################################################
+def default_worker_count():
+    # sched_getaffinity respects container/taskset limits but only exists on some platforms, so fall back to cpu_count
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+#######################################################################################################################
+# Function that expands a list of directories, glob patterns and/or file paths into a sorted list of card images
+# Parameters: an iterable of sources to search
+# Returns: a list of image paths with duplicates removed
+#######################################################################################################################
+def collect_images(sources):
+    paths = []
+    for source in sources:
+        # a directory means every image directly inside it
+        if os.path.isdir(source):
+            for filename in sorted(os.listdir(source)):
+                if "." in filename and filename.rsplit(".", 1)[1].lower() in IMAGE_EXTENSIONS:
+                    paths.append(os.path.join(source, filename))
+        # a single existing file is used as-is. anything else is treated as a glob pattern
+        elif os.path.isfile(source):
+            paths.append(source)
+        else:
+            paths.extend(sorted(glob.glob(source, recursive=True)))
+
+    # remove duplicates while keeping the original order
+    return list(dict.fromkeys(paths))
+
+#######################################################################################################################
+# Function that scans a single card inside a worker process. Errors are captured so one bad card can't stop the run
+# Parameters: the filepath to the card image. For a card cut out of a binder page, also its position on the page and
+#             the straightened card image itself. Lastly whether to use adaptive OCR
+# Returns: a JSON-friendly dictionary with either the card's data or the error that occurred. With adaptive OCR it
+#          also says which pass ("fast" or "heavy") resolved each region
+#######################################################################################################################
+def _scan_one(image_path, card_index=None, card_image=None, adaptive=False):
+    start = time.perf_counter()
+    result = {"image_path": image_path}
+    if card_index is not None:
+        result["card_index"] = card_index
+    trace = start_trace(os.path.basename(image_path))
+    try:
+        result["card"] = process_yugioh_card(card_image if card_image is not None else image_path, trace, adaptive)
+        result["ok"] = True
+    except Exception as e:
+        result["ok"] = False
+        result["error"] = f"{type(e).__name__}: {e}"
+    if adaptive:
+        result["passes"] = region_passes(trace)
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+#######################################################################################################################
+# Function that finds and straightens every card on a binder page inside a worker process
+# Parameters: the filepath to the page photo
+# Returns: ("cards", path, list of card images) on success or ("error", path, result dictionary) on failure, including
+#          a page where no cards were found, so it isn't silently left out of the results
+#######################################################################################################################
+def _detect_page(page_path):
+    try:
+        cards = detect_cards(page_path, whole_photo_fallback=False)
+    except Exception as e:
+        return "error", page_path, {"image_path": page_path, "ok": False, "error": f"{type(e).__name__}: {e}"}
+    if not cards:
+        return "error", page_path, {"image_path": page_path, "ok": False, "error": "no cards were found on the page"}
+    return "cards", page_path, cards
+
+#######################################################################################################################
+# Function that scans many card images in parallel across a process pool
+# Parameters: the image paths to scan, the number of worker processes (defaults to one per cpu core) and whether to
+#             use adaptive OCR
+# Returns: a generator yielding one result dictionary per card in the order the scans finish
+#######################################################################################################################
+def scan_batch(image_paths, workers=None, adaptive=False):
+    image_paths = list(image_paths)
+    if not image_paths:
+        return
+
+    # never start more processes than there are cards to scan
+    workers = min(workers or default_worker_count(), len(image_paths))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_scan_one, path, adaptive=adaptive) for path in image_paths]
+
+        # hand back each result the moment its worker finishes instead of waiting on the slowest card
+        for future in as_completed(futures):
+            yield future.result()
+
+#######################################################################################################################
+# Function that scans photos holding several cards each (e.g. 9-pocket binder pages). Each page is split into its
+# cards by the detection stage, and every card found is fed through the pipeline on the same process pool, so cards
+# from one page are scanned while other pages are still being split
+# Parameters: the page photo paths, the number of worker processes (defaults to one per cpu core) and whether to use
+#             adaptive OCR
+# Returns: a generator yielding one result dictionary per card (with its card_index on the page) as scans finish, plus
+#          an error result for each page that couldn't be split or had no cards on it
+#######################################################################################################################
+def scan_binder_pages(page_paths, workers=None, adaptive=False):
+    page_paths = list(page_paths)
+    if not page_paths:
+        return
+
+    with ProcessPoolExecutor(max_workers=workers or default_worker_count()) as pool:
+        pending = {pool.submit(_detect_page, path) for path in page_paths}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+
+                # a finished card scan (or a page that couldn't be split) goes straight back to the caller
+                if not isinstance(result, tuple):
+                    yield result
+                elif result[0] == "error":
+                    yield result[2]
+                # a finished page fans its cards out to the pool
+                else:
+                    _, page_path, cards = result
+                    for index, card_image in enumerate(cards):
+                        pending.add(pool.submit(_scan_one, page_path, index, card_image, adaptive))
+
+#######################################################################################################################
+# Function that adds up which pass of adaptive OCR resolved each region of one scan
+# Parameters: the running tally (region name -> {"fast": count, "heavy": count}) and the scan's region -> pass
+# Returns: the updated tally
+#######################################################################################################################
+def tally_passes(counts, passes):
+    for region, pass_name in passes.items():
+        region_counts = counts.setdefault(region, {"fast": 0, "heavy": 0})
+        region_counts[pass_name] = region_counts.get(pass_name, 0) + 1
+    return counts
+
+#######################################################################################################################
+# Function that runs the batch scanner from the command line and writes each result as one line of JSON
+# Parameters: optional list of arguments (defaults to sys.argv)
+# Returns: the exit code for the process (0 when every card scanned, 1 if any card failed)
+#######################################################################################################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan a folder or glob of Yugioh card images in parallel.")
+    parser.add_argument("sources", nargs="+", help="directories, glob patterns or image files to scan")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: cpu cores)")
+    parser.add_argument("--output", help="write JSONL results to this file instead of standard output")
+    parser.add_argument("--binder", action="store_true",
+                        help="each photo holds several cards (e.g. a binder page) that are split apart before scanning")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="OCR each region at a lower resolution first and only redo the unsure ones at full size")
+    args = parser.parse_args(argv)
+
+    image_paths = collect_images(args.sources)
+    if not image_paths:
+        print("No card images found.", file=sys.stderr)
+        return 1
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    scanned = failures = 0
+    pass_counts = {}
+    try:
+        scanner = scan_binder_pages if args.binder else scan_batch
+        for result in scanner(image_paths, workers=args.workers, adaptive=args.adaptive):
+            scanned += 1
+            tally_passes(pass_counts, result.get("passes", {}))
+            if not result["ok"]:
+                failures += 1
+            out.write(json.dumps(result) + "\n")
+            out.flush() # flush every line so results can be followed live with tail -f
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"Scanned {scanned} card(s) from {len(image_paths)} image(s), {failures} failed.", file=sys.stderr)
+    for region, counts in pass_counts.items():
+        print(f"  {region:<12} resolved by the fast pass: {counts['fast']}, the heavy pass: {counts['heavy']}",
+              file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines a benchmark that scans every sample card, checks each field against a ground-truth
+#                         manifest, and measures how long every stage of the pipeline takes
+#######################################################################################################################
+# Example usage: python benchmark.py --output before.json
+#                python benchmark.py --output after.json --compare before.json
+
+# imports
+import argparse                                                 # for parsing command line arguments
+import json                                                     # for reading the manifest and writing the report
+import os                                                       # for building file paths
+import platform                                                 # for recording what machine the run was on
+import sys                                                      # for writing to standard output
+import time                                                     # for timing the whole run
+from datetime import datetime, timezone                         # for stamping the report
+
+import numpy as np                                              # for the latency percentiles
+
+from batch_scan import collect_images, tally_passes             # for finding every sample image
+from tesseract import process_yugioh_card, region_passes       # for ocr image processing
+from YugiohCardDigitizer.data_layer.scan_cache import pipeline_version
+from YugiohCardDigitizer.extractors import ocr_engine
+from YugiohCardDigitizer.utils.tracing import start_trace
+
+# the fields of a scanned card that are checked against the manifest. atk_def is right only if both numbers are
+FIELDS = ("name", "attribute", "monster_type", "atk_def", "card_type")
+
+# the latency percentiles reported for every stage
+PERCENTILES = (50, 95)
+
+#######################################################################################################################
+# Function that pulls one field out of a card in a form that can be compared: strings ignore case and surrounding
+# spaces, and an empty string counts the same as no value
+# Parameters: the card dictionary and the field name
+# Returns: the comparable value
+#######################################################################################################################
+def _field_value(card, field):
+    if field == "atk_def":
+        return card.get("attack"), card.get("defense")
+    value = card.get(field)
+    if isinstance(value, str):
+        value = value.strip().casefold() or None
+    return value
+
+#######################################################################################################################
+# Function that checks every field of a scanned card against its ground truth
+# Parameters: the card dictionary returned by process_yugioh_card and the card's entry in the manifest
+# Returns: a dictionary of field -> True if it was read correctly
+#######################################################################################################################
+def score_card(card, truth):
+    return {field: _field_value(card, field) == _field_value(truth, field) for field in FIELDS}
+
+#######################################################################################################################
+# Function that summarizes a list of timings
+# Parameters: a list of seconds
+# Returns: a dictionary of "p50", "p95" etc. -> milliseconds
+#######################################################################################################################
+def percentiles(seconds):
+    values = np.percentile(np.asarray(seconds) * 1000, PERCENTILES)
+    return {f"p{p}": round(float(v), 3) for p, v in zip(PERCENTILES, values)}
+
+#######################################################################################################################
+# Function that scans every image and measures accuracy and latency
+# Parameters: the image paths, the ground-truth manifest (filename -> expected fields), how many times to scan each
+#             image for the latency numbers, how many untimed scans to run first so engines and indexes are warm, and
+#             whether to use adaptive OCR
+# Returns: the report as a JSON-friendly dictionary
+#######################################################################################################################
+def run_benchmark(image_paths, ground_truth, repeat=1, warmup=1, adaptive=False):
+    for path in image_paths[:warmup]:
+        try:
+            process_yugioh_card(path, adaptive=adaptive)
+        except Exception:
+            pass
+
+    stage_samples = {}      # stage name -> list of seconds across every scan
+    cards = []              # one entry per image, from its first run
+    pass_counts = {}        # region name -> how many times each adaptive OCR pass resolved it
+    start = time.perf_counter()
+    for run in range(repeat):
+        for path in image_paths:
+            trace = start_trace(os.path.basename(path))
+            try:
+                card, error = process_yugioh_card(path, trace, adaptive), None
+            except Exception as e:
+                card, error = None, f"{type(e).__name__}: {e}"
+
+            for stage, seconds in trace.stage_seconds().items():
+                stage_samples.setdefault(stage, []).append(seconds)
+            stage_samples.setdefault("total", []).append(trace.total_seconds)
+
+            # the pipeline gives the same answer every run, so accuracy and passes only need the first one
+            if run == 0:
+                tally_passes(pass_counts, region_passes(trace))
+                entry = {"image": os.path.basename(path), "ok": error is None}
+                truth = ground_truth.get(os.path.basename(path))
+                if error is not None:
+                    entry["error"] = error
+                else:
+                    entry["card"] = card
+                if truth is not None:
+                    entry["fields"] = score_card(card or {}, truth) if error is None else dict.fromkeys(FIELDS, False)
+                cards.append(entry)
+    elapsed = time.perf_counter() - start
+
+    # accuracy only counts images that are in the manifest
+    scored = [entry["fields"] for entry in cards if "fields" in entry]
+    accuracy = {field: round(sum(s[field] for s in scored) / len(scored), 4) if scored else None for field in FIELDS}
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "pipeline_version": pipeline_version(),
+        "ocr_engine": "tesserocr" if ocr_engine.tesserocr is not None else "pytesseract",
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "images": len(image_paths),
+        "scored_images": len(scored),
+        "repeat": repeat,
+        "adaptive": adaptive,
+        "images_per_second": round(len(image_paths) * repeat / elapsed, 3) if elapsed else None,
+        "accuracy": accuracy,
+        "latency_ms": {stage: percentiles(samples) for stage, samples in sorted(stage_samples.items())},
+        "passes": pass_counts,
+        "cards": cards,
+    }
+
+#######################################################################################################################
+# Function that lists the differences between an earlier report and a new one
+# Parameters: the old and new report dictionaries
+# Returns: a list of human-readable lines
+#######################################################################################################################
+def compare_reports(old, new):
+    lines = [f"pipeline {old.get('pipeline_version')} -> {new.get('pipeline_version')}"]
+
+    for field in FIELDS:
+        before, after = old["accuracy"].get(field), new["accuracy"].get(field)
+        if before is not None and after is not None:
+            lines.append(f"accuracy {field:<14}{before:7.1%} -> {after:7.1%} ({after - before:+.1%})")
+
+    before, after = old.get("images_per_second"), new.get("images_per_second")
+    if before and after:
+        lines.append(f"images per second     {before:7.2f} -> {after:7.2f} ({(after - before) / before:+.1%})")
+
+    for stage in sorted(set(old["latency_ms"]) | set(new["latency_ms"])):
+        b, a = old["latency_ms"].get(stage), new["latency_ms"].get(stage)
+        if b is None or a is None:
+            lines.append(f"latency {stage:<24}{'removed' if a is None else 'added'}")
+            continue
+        changes = "  ".join(f"{p} {b[p]:8.2f} -> {a[p]:8.2f}ms" for p in a if p in b)
+        lines.append(f"latency {stage:<24}{changes}")
+
+    for region in sorted(set(old.get("passes", {})) | set(new.get("passes", {}))):
+        b, a = old.get("passes", {}).get(region, {}), new.get("passes", {}).get(region, {})
+        lines.append(f"passes  {region:<24}fast {b.get('fast', 0):4d} -> {a.get('fast', 0):4d}  "
+                     f"heavy {b.get('heavy', 0):4d} -> {a.get('heavy', 0):4d}")
+
+    # name each card whose fields changed, so a regression can be traced to a specific image
+    old_cards = {entry["image"]: entry for entry in old.get("cards", [])}
+    for entry in new.get("cards", []):
+        previous = old_cards.get(entry["image"], {}).get("fields")
+        if previous and "fields" in entry:
+            for field in FIELDS:
+                if previous.get(field) != entry["fields"].get(field):
+                    status = "fixed" if entry["fields"].get(field) else "REGRESSED"
+                    lines.append(f"{status:<10}{entry['image']} {field}")
+    return lines
+
+#######################################################################################################################
+# Function that runs the benchmark from the command line and writes the report as JSON
+# Parameters: optional list of arguments (defaults to sys.argv)
+# Returns: the exit code for the process
+#######################################################################################################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure OCR accuracy and latency over the sample cards.")
+    parser.add_argument("--samples", default="samples", help="folder (or glob) of card images to scan")
+    parser.add_argument("--truth", default=os.path.join("samples", "ground_truth.json"),
+                        help="ground-truth manifest mapping image filename -> expected card fields")
+    parser.add_argument("--repeat", type=int, default=1, help="scan every image this many times for latency")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed scans to run first (default: 1)")
+    parser.add_argument("--adaptive", action="store_true", help="use adaptive OCR (low resolution pass first)")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the JSON report")
+    parser.add_argument("--compare", help="an earlier report to show the differences against")
+    args = parser.parse_args(argv)
+
+    image_paths = collect_images([args.samples])
+    if not image_paths:
+        print("No card images found.", file=sys.stderr)
+        return 1
+    with open(args.truth, encoding="utf-8") as f:
+        ground_truth = json.load(f)
+
+    report = run_benchmark(image_paths, ground_truth, repeat=max(1, args.repeat), warmup=args.warmup,
+                           adaptive=args.adaptive)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+
+    print(f"{report['images']} image(s), {report['images_per_second']} images/second ({report['ocr_engine']})")
+    for field, accuracy in report["accuracy"].items():
+        print(f"accuracy {field:<14}{accuracy:7.1%}" if accuracy is not None else f"accuracy {field:<14}    n/a")
+    for stage, stats in report["latency_ms"].items():
+        print(f"latency {stage:<24}" + "  ".join(f"{p} {ms:8.2f}ms" for p, ms in stats.items()))
+    for region, counts in report["passes"].items():
+        print(f"passes  {region:<24}fast {counts['fast']:4d}  heavy {counts['heavy']:4d}")
+    print(f"Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            old = json.load(f)
+        print()
+        print("\n".join(compare_reports(old, report)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
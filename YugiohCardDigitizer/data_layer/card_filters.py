@@ -0,0 +1,258 @@
+#####################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines filtering cards by type, attribute, monster type and ATK/DEF range, along with how
+#                         many cards have each type, attribute and monster type under the current filter (facet counts)
+#####################################################################################################################
+
+import functools        # for creating the tables only once per process
+
+from YugiohCardDigitizer.data_layer.database import reading, writing
+from YugiohCardDigitizer.data_layer.library_pages import decode_cursor, encode_cursor
+
+# how many cards a filter returns by default, and the most it can ask for
+RESULT_LIMIT = 50
+MAX_RESULT_LIMIT = 200
+
+# the columns that can be filtered to a set of values, and counted per value
+FACETS = ("card_type", "attribute", "monster_type")
+
+# the columns that can be filtered to a range of numbers
+RANGES = ("attack", "defense")
+
+# the columns of a card returned with the results, in the order they're selected
+CARD_COLUMNS = ("id", "name", "card_type", "monster_type", "description", "attack", "defense", "attribute",
+                "image_filename")
+
+# the triggers that keep the facet tables up to date
+TRIGGERS = ("card_facets_insert", "card_facets_delete", "card_facets_update")
+
+# ATK and DEF are numbers for monsters and "-" or "?" for everything else, which have no number to filter on
+_NUMBER = "(CASE typeof({0}) WHEN 'integer' THEN {0} END)"
+
+#######################################################################################################################
+# Function that creates the facet tables, their indexes and the triggers that keep them up to date, if needed.
+# card_facets is a narrow copy of the columns that can be filtered on, with ATK/DEF as plain numbers, so every filter
+# and count is answered from one of its covering indexes without reading the (much wider) cards table. Its columns
+# compare without case, so "LIGHT" and "Light" are the same attribute. card_facet_counts holds how many cards have
+# each value, which is the answer whenever nothing else is filtered
+# Parameters: none
+# Returns: void
+#######################################################################################################################
+@functools.lru_cache(maxsize=1)
+def _ensure_tables():
+    with writing() as db:
+        db.execute("SELECT 1 FROM sqlite_master WHERE name = 'card_facets'")
+        exists = db.fetchone() is not None
+
+        db.execute("""create table if not exists card_facets (
+                id integer primary key,
+                name text not null,
+                card_type text collate nocase,
+                attribute text collate nocase,
+                monster_type text collate nocase,
+                attack integer,
+                defense integer
+            )""")
+        db.execute("""create table if not exists card_facet_counts (
+                facet text not null,
+                value text not null collate nocase,
+                count integer not null,
+                primary key (facet, value)
+            ) without rowid""")
+
+        # one index led by each column a filter usually narrows on, each holding every filterable column so a query
+        # never has to leave the index. The name index serves the results, which come back in name order
+        db.execute("""create index if not exists card_facets_by_type
+                on card_facets (card_type, attribute, monster_type, attack, defense)""")
+        db.execute("""create index if not exists card_facets_by_attribute
+                on card_facets (attribute, card_type, monster_type, attack, defense)""")
+        db.execute("""create index if not exists card_facets_by_monster_type
+                on card_facets (monster_type, card_type, attribute, attack, defense)""")
+        db.execute("""create index if not exists card_facets_by_attack
+                on card_facets (attack, defense, card_type, attribute, monster_type)""")
+        db.execute("create index if not exists card_facets_by_name on card_facets (name)")
+
+        create_triggers(db)
+
+        # copy in the cards that were already there
+        if not exists:
+            add_cards(db, "SELECT id FROM cards")
+
+#######################################################################################################################
+# Function that creates the triggers that keep the facet tables up to date, if needed. A bulk import drops them while
+# it writes and keeps the tables up to date a whole batch at a time instead (see card_transfer)
+# Parameters: a cursor inside a write transaction
+# Returns: void
+#######################################################################################################################
+def create_triggers(db):
+    # the statements a trigger runs to add or take away a card's row and its counts
+    add_card = "\n".join([
+        f"""insert into card_facets (id, name, card_type, attribute, monster_type, attack, defense)
+            values (new.id, new.name, new.card_type, new.attribute, new.monster_type,
+                    {_NUMBER.format('new.attack')}, {_NUMBER.format('new.defense')});"""
+    ] + [
+        f"""insert into card_facet_counts (facet, value, count) select '{facet}', new.{facet}, 1
+            where new.{facet} is not null
+            on conflict (facet, value) do update set count = count + 1;"""
+        for facet in FACETS
+    ])
+    remove_card = "\n".join(["delete from card_facets where id = old.id;"] + [
+        f"""update card_facet_counts set count = count - 1 where facet = '{facet}' and value = old.{facet};
+            delete from card_facet_counts where facet = '{facet}' and value = old.{facet} and count <= 0;"""
+        for facet in FACETS
+    ])
+    db.execute(f"create trigger if not exists card_facets_insert after insert on cards begin {add_card} end")
+    db.execute(f"create trigger if not exists card_facets_delete after delete on cards begin {remove_card} end")
+    db.execute(f"""create trigger if not exists card_facets_update
+            after update of id, name, card_type, attribute, monster_type, attack, defense on cards
+            begin {remove_card} {add_card} end""")
+
+#######################################################################################################################
+# Functions that take cards out of the facet tables before they change, and put them back in afterwards, a whole set
+# of cards per statement rather than one card at a time
+# Parameters: a cursor inside a write transaction and a query selecting the ids of the cards
+# Returns: void
+#######################################################################################################################
+def remove_cards(db, ids_query):
+    # a correlated subquery rather than UPDATE ... FROM, which needs SQLite 3.33 or newer. The facet columns compare
+    # without case, the same as the counts' values, so "LIGHT" and "Light" are taken off the same count
+    for facet in FACETS:
+        db.execute(f"""
+            UPDATE card_facet_counts SET count = count - (
+                SELECT COUNT(*) FROM card_facets
+                WHERE id IN ({ids_query}) AND card_facets.{facet} = card_facet_counts.value
+            )
+            WHERE facet = '{facet}' AND value IN (
+                SELECT {facet} FROM card_facets WHERE id IN ({ids_query}) AND {facet} IS NOT NULL
+            )
+        """)
+    db.execute("DELETE FROM card_facet_counts WHERE count <= 0")
+    db.execute(f"DELETE FROM card_facets WHERE id IN ({ids_query})")
+
+def add_cards(db, ids_query):
+    db.execute(f"""
+        INSERT INTO card_facets (id, name, card_type, attribute, monster_type, attack, defense)
+        SELECT id, name, card_type, attribute, monster_type, {_NUMBER.format('attack')}, {_NUMBER.format('defense')}
+        FROM cards WHERE id IN ({ids_query})
+    """)
+    for facet in FACETS:
+        db.execute(f"""
+            INSERT INTO card_facet_counts (facet, value, count)
+            SELECT '{facet}', {facet}, COUNT(*) FROM card_facets
+            WHERE id IN ({ids_query}) AND {facet} IS NOT NULL GROUP BY {facet}
+            ON CONFLICT (facet, value) DO UPDATE SET count = count + excluded.count
+        """)
+
+#######################################################################################################################
+# Function that builds the WHERE clause for a filter, optionally leaving out one facet. Facet counts leave out their
+# own facet, so picking one attribute still shows how many cards every other attribute would add
+# Parameters: the filter dictionary (see filter_cards) and the facet to leave out, if any
+# Returns: a tuple of (the conditions joined with AND, or "1" if there are none, the list of parameters)
+#######################################################################################################################
+def _where(filters, skip=None):
+    conditions = []
+    parameters = []
+    for facet in FACETS:
+        values = filters.get(facet)
+        if facet != skip and values:
+            conditions.append(f"{facet} IN ({', '.join('?' * len(values))})")
+            parameters.extend(values)
+    for column in RANGES:
+        low, high = filters.get(column) or (None, None)
+        if low is not None:
+            conditions.append(f"{column} >= ?")
+            parameters.append(low)
+        if high is not None:
+            conditions.append(f"{column} <= ?")
+            parameters.append(high)
+    return " AND ".join(conditions) or "1", parameters
+
+#######################################################################################################################
+# Function that filters the library and counts every facet value under the filter
+# Parameters: a dictionary of the filter, where "card_type", "attribute" and "monster_type" map to lists of allowed
+#             values (any of them matches, an empty list allows everything) and "attack" and "defense" map to a
+#             (lowest, highest) tuple (either can be None for no limit), the cursor of the card the results start
+#             after or the cursor of the card they end before (at most one of them), and the most cards to return
+# Returns: a dictionary of the matching "cards" in name order, the "total" number of matching cards, the
+#          "next_cursor" and "prev_cursor" for the pages either side (None at either end), and "facets":
+#          facet -> {value: count}
+# Raises: ValueError for an invalid cursor
+#######################################################################################################################
+def filter_cards(filters, after=None, before=None, limit=RESULT_LIMIT):
+    limit = max(1, min(limit, MAX_RESULT_LIMIT))
+    where, parameters = _where(filters)
+    cursor = decode_cursor(before or after) if (before or after) else None
+
+    # a page going backwards is loaded in the opposite order starting from its last card, then flipped around
+    backwards = before is not None
+    direction = "DESC" if backwards else "ASC"
+
+    _ensure_tables()
+    with reading() as db:
+        # the page of results, continuing from the cursor's name and id. One extra is loaded to find out whether
+        # there's another page
+        page_where, page_parameters = where, list(parameters)
+        if cursor is not None:
+            page_where += f" AND (name, id) {'<' if backwards else '>'} (?, ?)"
+            page_parameters += [cursor[0], cursor[1]]
+        db.execute(f"SELECT id, name FROM card_facets WHERE {page_where} ORDER BY name {direction}, id {direction} "
+                   f"LIMIT ?", page_parameters + [limit + 1])
+        rows = db.fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if backwards:
+            rows.reverse()
+        ids = [row[0] for row in rows]
+
+        cards = []
+        if ids:
+            db.execute(f"SELECT {', '.join(CARD_COLUMNS)} FROM cards WHERE id IN ({', '.join('?' * len(ids))})", ids)
+            by_id = {row[0]: dict(zip(CARD_COLUMNS, row)) for row in db.fetchall()}
+            cards = [by_id[card_id] for card_id in ids if card_id in by_id]
+
+        # with nothing filtered, the precomputed counts already hold every answer
+        facets = {}
+        unfiltered = [facet for facet in FACETS if _where(filters, skip=facet)[0] == "1"]
+        if unfiltered:
+            db.execute(f"""
+                SELECT facet, value, count FROM card_facet_counts WHERE facet IN ({', '.join('?' * len(unfiltered))})
+                ORDER BY facet, value
+            """, unfiltered)
+            for facet, value, count in db.fetchall():
+                facets.setdefault(facet, {})[value] = count
+        for facet in FACETS:
+            if facet in unfiltered:
+                facets.setdefault(facet, {})
+                continue
+            facet_where, facet_parameters = _where(filters, skip=facet)
+            db.execute(f"""
+                SELECT {facet}, COUNT(*) FROM card_facets WHERE {facet_where} AND {facet} IS NOT NULL
+                GROUP BY {facet} ORDER BY {facet}
+            """, facet_parameters)
+            facets[facet] = dict(db.fetchall())
+
+        # every card has a type, so with nothing filtered the type counts add up to the whole library
+        if where == "1":
+            db.execute("SELECT IFNULL(SUM(count), 0) FROM card_facet_counts WHERE facet = 'card_type'")
+        else:
+            db.execute(f"SELECT COUNT(*) FROM card_facets WHERE {where}", parameters)
+        total = db.fetchone()[0]
+
+    # a page reached from a cursor always has the card that cursor came from on its other side
+    first = encode_cursor(rows[0][1], rows[0][0]) if rows else None
+    last = encode_cursor(rows[-1][1], rows[-1][0]) if rows else None
+    if backwards:
+        next_cursor, prev_cursor = last, first if more else None
+    else:
+        next_cursor, prev_cursor = last if more else None, first if cursor is not None else None
+
+    return {
+        "cards": cards,
+        "total": total,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+        "facets": facets,
+    }
@@ -0,0 +1,162 @@
+#####################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines full-text search over card names and descriptions, using an SQLite FTS5 index that
+#                         triggers keep in step with the cards table, ranked by bm25 with the matches highlighted
+#####################################################################################################################
+
+import functools        # for creating the index only once per process
+import re               # for splitting a search into words
+
+from markupsafe import escape   # for making card text safe to show as html
+
+from YugiohCardDigitizer.data_layer.database import reading, writing
+
+# how many results a search returns by default, and the most it can ask for
+RESULT_LIMIT = 20
+MAX_RESULT_LIMIT = 100
+
+# how much more a word in a card's name counts than the same word in its description when ranking
+NAME_WEIGHT = 10.0
+
+# the shortest half-typed word that also matches longer words. A single letter would match nearly every card, and
+# ranking them all is what makes a search slow
+MIN_PREFIX_LENGTH = 2
+
+# how many words of the description are shown around the matches
+SNIPPET_WORDS = 16
+
+# the words of a search. Anything else (quotes, operators, punctuation) is left out so no search can be an invalid
+# FTS5 query
+SEARCH_WORD_PATTERN = re.compile(r"\w+")
+
+# the triggers that keep the index in step with the cards table
+TRIGGERS = ("cards_fts_insert", "cards_fts_delete", "cards_fts_update")
+
+# characters that can't appear in card text, used to mark where highlights start and end before the text is escaped
+_HIGHLIGHT_START, _HIGHLIGHT_END = "\x02", "\x03"
+
+#######################################################################################################################
+# Function that creates the full-text index and the triggers that keep it in step with the cards table, if needed. The
+# index stores no copy of the text (it's an external content table over cards), and the triggers mean every write to
+# cards, from any route or script, updates it in the same transaction
+# Parameters: none
+# Returns: void
+#######################################################################################################################
+@functools.lru_cache(maxsize=1)
+def _ensure_index():
+    with writing() as db:
+        db.execute("SELECT 1 FROM sqlite_master WHERE name = 'cards_fts'")
+        exists = db.fetchone() is not None
+
+        # the prefix indexes make the half-typed last word of a search-as-you-type query a direct lookup
+        db.execute("""create virtual table if not exists cards_fts using fts5(
+                name, description,
+                content='cards', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )""")
+        create_triggers(db)
+
+        # index the cards that were already there
+        if not exists:
+            db.execute("insert into cards_fts (cards_fts) values ('rebuild')")
+
+#######################################################################################################################
+# Function that creates the triggers that keep the index in step with the cards table, if needed. A bulk import drops
+# them while it writes and keeps the index up to date a whole batch at a time instead (see card_transfer)
+# Parameters: a cursor inside a write transaction
+# Returns: void
+#######################################################################################################################
+def create_triggers(db):
+    db.execute("""create trigger if not exists cards_fts_insert after insert on cards begin
+            insert into cards_fts (rowid, name, description) values (new.id, new.name, new.description);
+        end""")
+    db.execute("""create trigger if not exists cards_fts_delete after delete on cards begin
+            insert into cards_fts (cards_fts, rowid, name, description)
+            values ('delete', old.id, old.name, old.description);
+        end""")
+    db.execute("""create trigger if not exists cards_fts_update after update of name, description on cards begin
+            insert into cards_fts (cards_fts, rowid, name, description)
+            values ('delete', old.id, old.name, old.description);
+            insert into cards_fts (rowid, name, description) values (new.id, new.name, new.description);
+        end""")
+
+#######################################################################################################################
+# Functions that take cards out of the index before they change, and put them back in afterwards, in one statement
+# each rather than one per card. The index stores no text, so taking a card out needs the text it was indexed with
+# Parameters: a cursor inside a write transaction and a query selecting the ids of the cards
+# Returns: void
+#######################################################################################################################
+def remove_cards(db, ids_query):
+    db.execute(f"""
+        INSERT INTO cards_fts (cards_fts, rowid, name, description)
+        SELECT 'delete', id, name, description FROM cards WHERE id IN ({ids_query})
+    """)
+
+def add_cards(db, ids_query):
+    db.execute(f"""
+        INSERT INTO cards_fts (rowid, name, description)
+        SELECT id, name, description FROM cards WHERE id IN ({ids_query})
+    """)
+
+#######################################################################################################################
+# Function that turns what the user typed into an FTS5 query. Every word has to match, and the last word also
+# matches longer words starting with it (if it's at least MIN_PREFIX_LENGTH long), since it's usually still being typed
+# Parameters: the search text
+# Returns: the FTS5 match expression, or None if the text has no words in it
+#######################################################################################################################
+def build_match_query(text):
+    words = SEARCH_WORD_PATTERN.findall(text or "")
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    if len(words[-1]) >= MIN_PREFIX_LENGTH:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+#######################################################################################################################
+# Function that escapes text returned by FTS5 and turns its highlight markers into <mark> tags
+# Parameters: the text with highlight markers
+# Returns: the html as a string
+#######################################################################################################################
+def _highlight_html(text):
+    html = str(escape(text or ""))
+    return html.replace(_HIGHLIGHT_START, "<mark>").replace(_HIGHLIGHT_END, "</mark>")
+
+#######################################################################################################################
+# Function that searches card names and descriptions, best matches first
+# Parameters: the search text and the most results to return
+# Returns: a list of dictionaries of each card's "id", "name", "card_type", "attribute" and "image_filename", plus the
+#          "name_html" and "snippet_html" with the matching words wrapped in <mark> tags (already html-escaped)
+#######################################################################################################################
+def search_cards(text, limit=RESULT_LIMIT):
+    query = build_match_query(text)
+    if query is None:
+        return []
+    limit = max(1, min(limit, MAX_RESULT_LIMIT))
+
+    _ensure_index()
+    with reading() as db:
+        db.execute(f"""
+            SELECT cards.id, cards.name, cards.card_type, cards.attribute, cards.image_filename,
+                   highlight(cards_fts, 0, ?, ?),
+                   snippet(cards_fts, 1, ?, ?, '…', {SNIPPET_WORDS})
+            FROM cards_fts JOIN cards ON cards.id = cards_fts.rowid
+            WHERE cards_fts MATCH ?
+            ORDER BY bm25(cards_fts, {NAME_WEIGHT}, 1.0)
+            LIMIT ?
+        """, (_HIGHLIGHT_START, _HIGHLIGHT_END, _HIGHLIGHT_START, _HIGHLIGHT_END, query, limit))
+        rows = db.fetchall()
+
+    return [{
+        "id": row[0],
+        "name": row[1],
+        "card_type": row[2],
+        "attribute": row[3],
+        "image_filename": row[4],
+        "name_html": _highlight_html(row[5]),
+        "snippet_html": _highlight_html(row[6]),
+    } for row in rows]
@@ -0,0 +1,242 @@
+#####################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines bulk import of cards from CSV or JSON Lines files and export of the library in the
+#                         same formats. Both stream their rows, so a library of any size never has to fit in memory
+#####################################################################################################################
+# Run this file directly to import or export from the command line:
+#     python -m YugiohCardDigitizer.data_layer.card_transfer import my_collection.csv
+#     python -m YugiohCardDigitizer.data_layer.card_transfer export my_collection.jsonl
+
+import csv              # for reading and writing CSV
+import io               # for building CSV text a row at a time
+import itertools        # for splitting the rows into batches
+import json             # for reading and writing JSON Lines
+import os               # for telling the formats apart by extension
+import sys              # for the command line entrypoint
+import time             # for timing an import
+
+from YugiohCardDigitizer.data_layer import card_filters, card_search
+from YugiohCardDigitizer.data_layer.database import reading, writing
+
+# the columns a card file can have. Only name and card_type are required, and any other column is ignored
+CARD_FIELDS = ("name", "card_type", "monster_type", "description", "attack", "defense", "attribute", "image_filename")
+REQUIRED_FIELDS = ("name", "card_type")
+
+# the columns written when exporting, in order. The id is included for reference but ignored when imported again
+EXPORT_FIELDS = ("id",) + CARD_FIELDS
+
+# how many cards are written per transaction. Each commit syncs to disk, so big batches are much faster than a commit
+# per card, while still keeping any one transaction (and the time readers see the old data) short
+BATCH_SIZE = 5000
+
+# the modules whose tables are kept up to date by triggers on cards. The triggers run several statements for every
+# card written, so an import drops them for each batch and has the module update its tables for the whole batch at
+# once instead, which is about twice as fast
+DERIVED_TABLES = (card_search, card_filters)
+
+# how many rows an export reads from the database at a time
+EXPORT_CHUNK = 1000
+
+# the file formats, by extension
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+# each batch is written to this table first, so it can be upserted and its search index and facets updated in one
+# statement each
+STAGING_TABLE_SQL = f"create temp table if not exists card_import ({', '.join(CARD_FIELDS)})"
+
+# inserts each staged card, or updates the card that already has that name. A card file without images doesn't wipe
+# out the images of cards already in the library. (The WHERE true is how SQLite tells an upsert from a join)
+UPSERT_SQL = f"""
+    INSERT INTO cards ({', '.join(CARD_FIELDS)}) SELECT {', '.join(CARD_FIELDS)} FROM temp.card_import WHERE true
+    ON CONFLICT (name) DO UPDATE SET
+        card_type = excluded.card_type,
+        monster_type = excluded.monster_type,
+        description = excluded.description,
+        attack = excluded.attack,
+        defense = excluded.defense,
+        attribute = excluded.attribute,
+        image_filename = COALESCE(excluded.image_filename, cards.image_filename)
+"""
+
+# the cards in the library with the name of a staged card: the ones a batch updates, and after it, the ones it wrote
+STAGED_IDS_SQL = "SELECT id FROM cards WHERE name IN (SELECT name FROM temp.card_import)"
+
+#######################################################################################################################
+# Function that works out the format of a card file from its name
+# Parameters: the filename
+# Returns: "csv" or "jsonl"
+# Raises: ValueError for any other extension
+#######################################################################################################################
+def format_for(filename):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Unsupported file type {extension!r}. Use .csv or .jsonl")
+    return FORMATS[extension]
+
+#######################################################################################################################
+# Function that reads the cards in a file one at a time
+# Parameters: an open text file and its format ("csv" or "jsonl")
+# Returns: a generator of (line number, card dictionary). A line that isn't valid JSON gives None, so it's skipped
+#          rather than stopping the whole import
+#######################################################################################################################
+def read_cards(file, fmt):
+    if fmt == "csv":
+        reader = csv.DictReader(file)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError:
+                yield line_number, None
+
+#######################################################################################################################
+# Function that turns a card read from a file into the values of an upsert. Surrounding spaces are trimmed and empty
+# values become NULL, the same as a card added through the web app
+# Parameters: the card dictionary
+# Returns: the tuple of values in CARD_FIELDS order
+# Raises: ValueError if it isn't a card, a value isn't text or a number, or a required field is missing
+#######################################################################################################################
+def card_values(record):
+    if not isinstance(record, dict):
+        raise ValueError("not a card")
+    values = []
+    for field in CARD_FIELDS:
+        value = record.get(field)
+        if isinstance(value, str):
+            value = value.strip() or None
+        elif value is not None and not isinstance(value, (int, float)):
+            raise ValueError(f"{field} must be text or a number")
+        values.append(value)
+    card = dict(zip(CARD_FIELDS, values))
+    for field in REQUIRED_FIELDS:
+        if card[field] is None:
+            raise ValueError(f"missing {field}")
+    # the cards table needs a description, even an empty one
+    if card["description"] is None:
+        card["description"] = ""
+    return tuple(card[field] for field in CARD_FIELDS)
+
+#######################################################################################################################
+# Function that writes one batch of cards. The derived tables' triggers are dropped for the batch and put back at the
+# end of the same transaction, so no reader or later write ever sees cards without their search index and facets, and
+# an error rolls the triggers back in along with everything else
+# Parameters: a cursor inside a write transaction and the list of upsert values
+# Returns: the number of cards written. A name that's in the batch more than once is one card, the last row winning
+#######################################################################################################################
+def _write_batch(db, batch):
+    db.execute(STAGING_TABLE_SQL)
+    db.execute("DELETE FROM temp.card_import")
+    db.executemany(f"INSERT INTO temp.card_import VALUES ({', '.join('?' * len(CARD_FIELDS))})", batch)
+
+    # a table that hasn't been created yet is built from every card the first time it's used anyway
+    db.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+    existing = {row[0] for row in db.fetchall()}
+    derived = [module for module in DERIVED_TABLES if existing.issuperset(module.TRIGGERS)]
+    for module in derived:
+        for trigger in module.TRIGGERS:
+            db.execute(f"DROP TRIGGER {trigger}")
+        module.remove_cards(db, STAGED_IDS_SQL)
+
+    db.execute(UPSERT_SQL)
+
+    for module in derived:
+        module.add_cards(db, STAGED_IDS_SQL)
+        module.create_triggers(db)
+
+    db.execute("SELECT COUNT(DISTINCT name) FROM temp.card_import")
+    return db.fetchone()[0]
+
+#######################################################################################################################
+# Function that imports cards into the library in batches, adding new cards and updating the ones whose name is
+# already there
+# Parameters: an iterable of (line number, card dictionary) as returned by read_cards, and the batch size
+# Returns: a dictionary of how many cards were "imported", how many rows were "skipped", and the first few "errors"
+#######################################################################################################################
+def import_cards(records, batch_size=BATCH_SIZE):
+    imported = skipped = 0
+    errors = []
+
+    def valid_rows():
+        nonlocal skipped
+        for line_number, record in records:
+            try:
+                yield card_values(record)
+            except ValueError as e:
+                skipped += 1
+                if len(errors) < 20:
+                    errors.append(f"line {line_number}: {e}")
+
+    rows = valid_rows()
+    while batch := list(itertools.islice(rows, batch_size)):
+        with writing() as db:
+            imported += _write_batch(db, batch)
+    return {"imported": imported, "skipped": skipped, "errors": errors}
+
+#######################################################################################################################
+# Function that reads every card in the library, a chunk at a time
+# Parameters: none
+# Returns: a generator of card dictionaries in name order
+#######################################################################################################################
+def iter_cards():
+    with reading() as db:
+        db.execute(f"SELECT {', '.join(EXPORT_FIELDS)} FROM cards ORDER BY name")
+        while rows := db.fetchmany(EXPORT_CHUNK):
+            for row in rows:
+                yield dict(zip(EXPORT_FIELDS, row))
+
+#######################################################################################################################
+# Functions that export the library as text, a chunk at a time, for streaming straight into a response or a file
+# Parameters: none
+# Returns: a generator of text chunks
+#######################################################################################################################
+def export_csv():
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for count, card in enumerate(iter_cards(), start=1):
+        writer.writerow(card)
+        if count % EXPORT_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def export_jsonl():
+    lines = []
+    for card in iter_cards():
+        lines.append(json.dumps(card, ensure_ascii=False) + "\n")
+        if len(lines) == EXPORT_CHUNK:
+            yield "".join(lines)
+            lines = []
+    yield "".join(lines)
+
+EXPORTERS = {"csv": export_csv, "jsonl": export_jsonl}
+
+# if the file is run directly, import or export a card file
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in ("import", "export"):
+        print("usage: python -m YugiohCardDigitizer.data_layer.card_transfer import|export <file.csv|file.jsonl>")
+        sys.exit(1)
+    command, path = sys.argv[1:]
+    fmt = format_for(path)
+
+    if command == "import":
+        start = time.perf_counter()
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            result = import_cards(read_cards(f, fmt))
+        print(f"Imported {result['imported']} card(s) in {time.perf_counter() - start:.1f}s, "
+              f"skipped {result['skipped']}.")
+        for error in result["errors"]:
+            print(f"  {error}")
+    else:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            for chunk in EXPORTERS[fmt]():
+                f.write(chunk)
+        print(f"Exported the library to {path}")
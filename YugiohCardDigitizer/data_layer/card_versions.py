@@ -0,0 +1,58 @@
+#####################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines the ETags of the card API: a version of the whole library that triggers bump on
+#                         every change to the cards table, and a hash of each single card
+#####################################################################################################################
+
+import functools        # for creating the table only once per process
+import hashlib          # for hashing a card
+import json             # for turning a card into bytes to hash
+
+from YugiohCardDigitizer.data_layer.database import reading, writing
+
+#######################################################################################################################
+# Function that creates the library version table and the triggers that bump it, if needed. The table has one row.
+# Its epoch is random and chosen when the table is created, so a database that's deleted and recreated (as
+# create_database.py does) never hands out an ETag that an older database already used
+# Parameters: none
+# Returns: void
+#######################################################################################################################
+@functools.lru_cache(maxsize=1)
+def _ensure_table():
+    with writing() as db:
+        db.execute("""create table if not exists library_version (
+                id integer primary key check (id = 1),
+                epoch text not null,
+                version integer not null
+            )""")
+        db.execute("""insert or ignore into library_version (id, epoch, version)
+                values (1, lower(hex(randomblob(8))), 0)""")
+        for event in ("insert", "update", "delete"):
+            db.execute(f"""create trigger if not exists library_version_{event} after {event} on cards begin
+                    update library_version set version = version + 1 where id = 1;
+                end""")
+
+#######################################################################################################################
+# Function that returns the ETag of the whole library. It changes whenever any card is added, changed or deleted, by
+# any route, script or process, so it's the ETag of every list of cards
+# Parameters: none
+# Returns: the ETag, without quotes
+#######################################################################################################################
+def library_etag():
+    _ensure_table()
+    with reading() as db:
+        db.execute("SELECT epoch, version FROM library_version WHERE id = 1")
+        epoch, version = db.fetchone()
+    return f"{epoch}-{version}"
+
+#######################################################################################################################
+# Function that returns the ETag of a single card, a hash of everything in it. Changes to other cards leave it alone
+# Parameters: the card dictionary
+# Returns: the ETag, without quotes
+#######################################################################################################################
+def card_etag(card):
+    card_json = json.dumps(card, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(card_json.encode("utf-8")).hexdigest()[:32]
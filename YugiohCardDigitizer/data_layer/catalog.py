@@ -0,0 +1,55 @@
+#####################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines functions for loading the local catalog of every known Yugioh card, which OCR
+#                         results are corrected against
+#####################################################################################################################
+# The catalog uses the same format as the YGOPRODeck card database (https://db.ygoprodeck.com/api/v7/cardinfo.php),
+# so the full list of cards can be downloaded and saved over data_layer/cardinfo.json as-is. The copy shipped with
+# the project only holds the sample cards
+
+import json             # for reading the catalog file
+import os               # for building file paths
+import threading        # for making the loaded catalog safe to share between threads
+
+BASE_DIR = os.path.dirname(__file__)                    # folder where catalog.py lives
+CATALOG_PATH = os.path.join(BASE_DIR, "cardinfo.json")  # the catalog lives next to Cards.sqlite3
+
+# catalogs already loaded in this process, keyed by the absolute path of their file
+_CATALOGS = {}
+_CATALOGS_LOCK = threading.Lock()
+
+#######################################################################################################################
+# Function that describes the current state of a catalog file so changes to it can be detected cheaply
+# Parameters: the filepath of the catalog
+# Returns: a tuple of (modified time, size), or None if the file doesn't exist
+#######################################################################################################################
+def catalog_signature(path=CATALOG_PATH):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+#######################################################################################################################
+# Function that returns every card in the catalog, reading the file on first use and again only if it has changed
+# Parameters: the filepath of the catalog
+# Returns: a list of card dictionaries (name, desc, type, race, atk, def, attribute, ...). Empty if there's no catalog
+#######################################################################################################################
+def load_catalog(path=CATALOG_PATH):
+    key = os.path.abspath(path)
+    signature = catalog_signature(key)
+
+    with _CATALOGS_LOCK:
+        cached = _CATALOGS.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        cards = []
+        if signature is not None:
+            with open(key, encoding="utf-8") as f:
+                cards = [card for card in json.load(f).get("data", []) if card.get("name")]
+        _CATALOGS[key] = (signature, cards)
+        return cards
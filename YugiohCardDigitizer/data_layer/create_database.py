@@ -18,6 +18,12 @@ if os.path.exists(db_details):
     os.remove(db_details)
     print("Old Cards.sqlite3 deleted. Rebuilding database...\n")
 
+# the app runs the database in WAL mode, so also delete its write-ahead log. Left behind, it would be replayed into
+# the new database
+for suffix in ("-wal", "-shm"):
+    if os.path.exists(db_details + suffix):
+        os.remove(db_details + suffix)
+
 insert_SQL = """
     INSERT INTO cards (name, card_type, monster_type, description, attack, defense, attribute, image_filename)
     VALUES (?, ?, ?, ?, ?, ?, ?, ?)
@@ -0,0 +1,168 @@
+#####################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines how the app talks to its SQLite databases. Reads borrow an already open connection
+#                         from a pool instead of connecting for every query, and every write goes through one shared
+#                         writer connection, one write at a time. The database runs in WAL mode, so reads never wait
+#                         on that writer
+#####################################################################################################################
+
+import contextlib       # for the reading and writing context managers
+import os               # for building file paths and noticing when a database file is replaced
+import queue            # for the pools of reading connections
+import sqlite3          # for database functionality
+import threading        # for the writer's lock
+
+BASE_DIR = os.path.dirname(__file__)                        # folder where database.py lives
+# the card library. YUGIOH_CARDS_DB points the app at another file instead, as the tests do
+CARDS_DB = os.environ.get("YUGIOH_CARDS_DB") or os.path.join(BASE_DIR, "Cards.sqlite3")
+
+# the most idle reading connections kept open per database. Flask's server runs every request on a new thread, so
+# connections are handed from one request to the next through the pool. A burst of more concurrent reads than this
+# opens extra connections, which are closed when they're given back
+MAX_IDLE_READERS = 8
+
+# how many prepared statements each connection keeps. The app only runs a few dozen different queries, so after the
+# first request every query skips being parsed and planned again
+CACHED_STATEMENTS = 256
+
+# the settings every connection is opened with:
+#   journal_mode=WAL      readers see the last committed data while a write is in progress instead of waiting for it
+#   synchronous=NORMAL    in WAL mode a commit can't corrupt the database, it only syncs to disk at checkpoints
+#   busy_timeout          wait up to 5 seconds for a lock (e.g. another process writing) instead of failing at once
+#   cache_size            keep up to 16 MB of pages in memory per connection
+#   temp_store=MEMORY     sort and group in memory rather than temporary files
+#   mmap_size             read the database through memory-mapped I/O, up to 64 MB
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 67108864",
+)
+
+_reader_pools = {}              # database path -> LIFO queue of idle (reading connection, the file it has open)
+_writers = {}                   # database path -> (the writer connection, the file it has open)
+_writer_locks = {}              # database path -> the lock that lets one write through at a time
+_writers_lock = threading.Lock()
+
+#######################################################################################################################
+# Function that opens a connection with the app's settings. It's left in autocommit mode, so a read never holds a
+# transaction open, and writes open their own (see writing)
+# Parameters: the database's filepath
+# Returns: the sqlite3 connection
+#######################################################################################################################
+def connect(db_path):
+    connection = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False,
+                                 cached_statements=CACHED_STATEMENTS)
+    for pragma in PRAGMAS:
+        connection.execute(pragma)
+    return connection
+
+# identifies the database file on disk, so a connection to a file that was deleted and recreated (as
+# create_database.py does) isn't reused. None if the file doesn't exist yet
+def _file_id(db_path):
+    try:
+        stat = os.stat(db_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+#######################################################################################################################
+# Function that returns a database's pool of idle reading connections, creating it the first time
+# Parameters: the database's filepath
+# Returns: the queue.LifoQueue. The most recently used connection is handed out first, so its cache is warmest
+#######################################################################################################################
+def _reader_pool(db_path):
+    with _writers_lock:
+        return _reader_pools.setdefault(db_path, queue.LifoQueue(maxsize=MAX_IDLE_READERS))
+
+#######################################################################################################################
+# Function that reads from a database on a pooled connection, giving it back to the pool afterwards. Use it like
+# DBcm.UseDatabase:
+#     with reading() as db:
+#         db.execute("SELECT ...")
+# Parameters: the database's filepath
+# Returns: a cursor (through the with statement)
+#######################################################################################################################
+@contextlib.contextmanager
+def reading(db_path=CARDS_DB):
+    pool = _reader_pool(db_path)
+    file_id = _file_id(db_path)
+
+    # take an idle connection, closing any left open on a database file that has since been deleted and recreated
+    connection = None
+    while connection is None:
+        try:
+            candidate, connected_file = pool.get_nowait()
+        except queue.Empty:
+            connection = connect(db_path)
+            connected_file = _file_id(db_path)
+            break
+        if file_id is not None and connected_file == file_id:
+            connection = candidate
+        else:
+            candidate.close()
+
+    cursor = connection.cursor()
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+        try:
+            pool.put_nowait((connection, connected_file))
+        except queue.Full:
+            connection.close()
+
+#######################################################################################################################
+# Function that writes to a database through its single writer connection. Writes wait their turn on a lock, so two
+# requests never fight over SQLite's write lock, and everything inside the with statement is one transaction: it's
+# committed at the end, or rolled back if an error is raised
+#     with writing() as db:
+#         db.execute("UPDATE ...")
+# Parameters: the database's filepath
+# Returns: a cursor (through the with statement)
+#######################################################################################################################
+@contextlib.contextmanager
+def writing(db_path=CARDS_DB):
+    with _writers_lock:
+        lock = _writer_locks.setdefault(db_path, threading.Lock())
+
+    with lock:
+        connection, connected_file = _writers.get(db_path, (None, None))
+        file_id = _file_id(db_path)
+        if connection is None or file_id is None or connected_file != file_id:
+            if connection is not None:
+                connection.close()
+            connection = connect(db_path)
+            _writers[db_path] = (connection, _file_id(db_path))
+
+        # take the write lock up front, so a transaction that reads before it writes can't be refused halfway through
+        cursor = connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            yield cursor
+        except BaseException:
+            connection.rollback()
+            raise
+        else:
+            connection.commit()
+        finally:
+            cursor.close()
+
+#######################################################################################################################
+# Function that forgets every connection in a forked child process. SQLite connections must not be shared across a
+# fork, so the child opens its own the first time it needs one
+#######################################################################################################################
+def _reset_connections():
+    global _reader_pools, _writers, _writer_locks, _writers_lock
+    _reader_pools = {}
+    _writers = {}
+    _writer_locks = {}
+    _writers_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_connections)
@@ -0,0 +1,225 @@
+#####################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines where uploaded card images are stored. Each image is saved under the SHA-256 of its
+#                         bytes, so the same photo is only stored once and two different photos can never overwrite
+#                         each other, and is indexed by a perceptual hash so a new photo of a card already in the
+#                         library can be caught before it's scanned
+#####################################################################################################################
+# Run this file directly to index images saved before the index existed:
+#     python -m YugiohCardDigitizer.data_layer.image_store backfill
+
+import functools        # for creating the table only once per process
+import io               # for opening uploaded bytes as an image
+import os               # for building file paths
+import sys              # for the command line entrypoint
+import time             # for stamping when each image was stored
+
+import numpy as np      # for comparing neighbouring pixels
+from PIL import Image
+
+from YugiohCardDigitizer.data_layer.database import reading, writing
+from YugiohCardDigitizer.data_layer.scan_cache import file_digest, image_digest
+from YugiohCardDigitizer.preprocessing.normalize import open_image
+from YugiohCardDigitizer.utils.files import write_file
+from YugiohCardDigitizer.utils.thumbnails import CARDS_DIR, delete_thumbnails
+
+# the extension each image format is saved with, whatever the upload was called
+FORMAT_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif"}
+
+# the size of the difference hash. 8 rows of 9 pixels give 8 comparisons per row, 64 bits in all
+HASH_SIZE = 8
+
+# the most bits two hashes can differ by and still be the same card. Re-encoded, cropped or relit photos of a sample
+# card differ by 6 or fewer, while the closest two different cards differ by 18
+NEAR_DUPLICATE_DISTANCE = 10
+
+_HASH_MASK = (1 << 64) - 1
+
+#######################################################################################################################
+# Function that computes the perceptual (difference) hash of an image. The image is shrunk to 9x8 grayscale pixels
+# and each bit records whether a pixel is brighter than its left neighbour, so the hash survives resizing,
+# recompression and lighting changes that would change every byte of the file
+# Parameters: a filepath or an already opened PIL image
+# Returns: the hash as an unsigned 64 bit integer
+#######################################################################################################################
+def difference_hash(source):
+    # decoding in draft mode is plenty. Only 72 pixels survive
+    img = open_image(source, mode="L", min_size=(HASH_SIZE * 8, HASH_SIZE * 8))
+    pixels = np.asarray(img.resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+#######################################################################################################################
+# Function that counts how many bits two hashes differ by
+# Parameters: the two hashes
+# Returns: the Hamming distance between them
+#######################################################################################################################
+def hash_distance(a, b):
+    return ((a ^ b) & _HASH_MASK).bit_count()
+
+# SQLite integers are signed, so hashes with the top bit set are stored as negative numbers
+def _to_signed(value):
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+#######################################################################################################################
+# Function that creates the image index table if needed
+# Parameters: none
+# Returns: void
+#######################################################################################################################
+@functools.lru_cache(maxsize=1)
+def _ensure_table():
+    with writing() as db:
+        db.execute("""create table if not exists card_images (
+                filename varchar(500) not null primary key,
+                sha256 char(64) not null,
+                dhash integer not null,
+                created_at real not null
+            )""")
+        db.execute("create index if not exists card_images_sha256 on card_images (sha256)")
+
+#######################################################################################################################
+# Function that adds an image to the index
+# Parameters: the image's filename (inside static/images/cards), its SHA-256 and its difference hash
+# Returns: void
+#######################################################################################################################
+def _index_image(filename, sha256, dhash):
+    _ensure_table()
+    with writing() as db:
+        db.execute("INSERT OR REPLACE INTO card_images (filename, sha256, dhash, created_at) VALUES (?, ?, ?, ?)",
+                   (filename, sha256, _to_signed(dhash), time.time()))
+
+#######################################################################################################################
+# Function that saves an uploaded image under its content address. Uploading the same bytes again, whatever the file
+# is called, gives back the image already stored instead of a second copy
+# Parameters: the uploaded file (a werkzeug FileStorage) or the raw bytes of the image
+# Returns: the stored image's filename (inside static/images/cards)
+# Raises: ValueError if the upload isn't a png, jpg or gif image
+#######################################################################################################################
+def store_image(upload):
+    image_bytes = upload if isinstance(upload, bytes) else upload.read()
+    sha256 = image_digest(image_bytes)
+
+    # the same bytes may already be stored, possibly under a name from before images were content addressed
+    _ensure_table()
+    with reading() as db:
+        db.execute("SELECT filename FROM card_images WHERE sha256 = ? ORDER BY created_at LIMIT 1", (sha256,))
+        row = db.fetchone()
+    if row and os.path.exists(os.path.join(CARDS_DIR, row[0])):
+        return row[0]
+
+    # the file's real format decides its extension, so a renamed file can't pretend to be something else
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            extension = FORMAT_EXTENSIONS.get(img.format)
+            dhash = difference_hash(img) if extension else None
+    except Exception as e:
+        raise ValueError(f"Not a readable image: {e}") from e
+    if extension is None:
+        raise ValueError("Unsupported image format")
+
+    filename = f"{sha256}.{extension}"
+    path = os.path.join(CARDS_DIR, filename)
+    if not os.path.exists(path):
+        # write to a temporary name and swap it in, so a page never sees a half-written image
+        os.makedirs(CARDS_DIR, exist_ok=True)
+        write_file(path, image_bytes)
+    _index_image(filename, sha256, dhash)
+    return filename
+
+#######################################################################################################################
+# Function that finds the stored image that looks most like another one, preferring images a card in the library
+# uses. Photos of a card the library already has are caught this way before OCR runs on them, and so are exact
+# re-uploads of a card's own image, which match that image itself
+# Parameters: the stored image's filename, and the most bits the hashes may differ by
+# Returns: a dictionary of the match's "filename", "distance", and the "card_id" and "card_name" of the library card
+#          using it (both None if no card does), or None if nothing is close enough
+#######################################################################################################################
+def find_near_duplicate(filename, max_distance=NEAR_DUPLICATE_DISTANCE):
+    _ensure_table()
+    with reading() as db:
+        db.execute("SELECT dhash FROM card_images WHERE filename = ?", (filename,))
+        row = db.fetchone()
+        if row is None:
+            return None
+        target = row[0] & _HASH_MASK
+
+        # a Hamming distance can't be indexed, but a hash is only 8 bytes, so comparing them all is quick
+        db.execute("""
+            SELECT card_images.filename, card_images.dhash, cards.id, cards.name
+            FROM card_images LEFT JOIN cards ON cards.image_filename = card_images.filename
+        """)
+        rows = db.fetchall()
+
+    best = None
+    for other, dhash, card_id, card_name in rows:
+        # re-uploading the exact bytes of a card's image gives back that same stored image, which is the best match of
+        # all. The image on its own, with no card using it, isn't a match for itself
+        if other == filename and card_id is None:
+            continue
+        distance = hash_distance(target, dhash)
+        if distance > max_distance:
+            continue
+        # a match a library card uses beats a closer one that nobody does
+        key = (card_id is None, distance)
+        if best is None or key < best[0]:
+            best = (key, {"filename": other, "distance": distance, "card_id": card_id, "card_name": card_name})
+    return best[1] if best else None
+
+#######################################################################################################################
+# Function that deletes a stored image, its thumbnails and its index entry, but only once no card uses it anymore.
+# Content addressing means several cards can share one image
+# Parameters: the image's filename
+# Returns: True if the image was deleted, False if a card still uses it
+#######################################################################################################################
+def release_image(filename):
+    if not filename:
+        return False
+    _ensure_table()
+    with writing() as db:
+        db.execute("SELECT COUNT(*) FROM cards WHERE image_filename = ?", (filename,))
+        if db.fetchone()[0]:
+            return False
+        db.execute("DELETE FROM card_images WHERE filename = ?", (filename,))
+
+    path = os.path.join(CARDS_DIR, filename)
+    if os.path.exists(path):
+        os.remove(path)
+    delete_thumbnails(filename)
+    return True
+
+#######################################################################################################################
+# Function that indexes every card image saved before the index existed. They keep their filenames
+# Parameters: none
+# Returns: a tuple of (images checked, images indexed)
+#######################################################################################################################
+def backfill_index():
+    _ensure_table()
+    with reading() as db:
+        db.execute("SELECT filename FROM card_images")
+        indexed = {row[0] for row in db.fetchall()}
+
+    checked = added = 0
+    for filename in sorted(os.listdir(CARDS_DIR)):
+        path = os.path.join(CARDS_DIR, filename)
+        if not os.path.isfile(path):
+            continue
+        checked += 1
+        if filename in indexed:
+            continue
+        try:
+            _index_image(filename, file_digest(path), difference_hash(path))
+            added += 1
+        except Exception as e:
+            print(f"Skipped {filename}: {e}")
+    return checked, added
+
+# if the file is run directly, index the images already saved
+if __name__ == "__main__":
+    if sys.argv[1:] != ["backfill"]:
+        print("usage: python -m YugiohCardDigitizer.data_layer.image_store backfill")
+        sys.exit(1)
+    checked, added = backfill_index()
+    print(f"Indexed {added} of {checked} card image(s).")
@@ -0,0 +1,150 @@
+#####################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines how the library is split into pages. Each page continues from the sort key and id
+#                         of the last card on the page before it (keyset pagination), so with an index on every sort
+#                         key the thousandth page costs the same to load as the first
+#####################################################################################################################
+
+import base64           # for turning cursors into short url-safe strings
+import functools        # for creating the indexes only once per process
+import json             # for encoding a cursor's sort value with its type intact
+
+from YugiohCardDigitizer.data_layer.database import reading, writing
+
+# how many cards are shown on a page by default, and the most a page can ask for
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# the columns of a card, in the order they're selected
+CARD_COLUMNS = ("id", "name", "card_type", "monster_type", "description", "attack", "defense", "attribute",
+                "image_filename")
+
+# the keys the library can be sorted by -> the SQL expression sorted on. Every expression is indexed together with the
+# id (see _ensure_indexes), and must be written exactly the same in the query for SQLite to use that index. ATK and
+# DEF are numbers for monsters and "-" or "?" for everything else, so anything that isn't a number sorts as -1
+SORT_KEYS = {
+    "name": "name",
+    "type": "card_type COLLATE NOCASE",
+    "attribute": "IFNULL(attribute, '') COLLATE NOCASE",
+    "monster_type": "IFNULL(monster_type, '') COLLATE NOCASE",
+    "attack": "(CASE typeof(attack) WHEN 'integer' THEN attack ELSE -1 END)",
+    "defense": "(CASE typeof(defense) WHEN 'integer' THEN defense ELSE -1 END)",
+}
+
+# the direction each key sorts in unless another is asked for. The strongest monsters come first
+DEFAULT_ORDERS = {"attack": "desc", "defense": "desc"}
+
+#######################################################################################################################
+# Function that creates an index for every sort key if needed
+# Parameters: none
+# Returns: void
+#######################################################################################################################
+@functools.lru_cache(maxsize=1)
+def _ensure_indexes():
+    with writing() as db:
+        for key, expression in SORT_KEYS.items():
+            db.execute(f"create index if not exists cards_sort_{key} on cards ({expression}, id)")
+
+#######################################################################################################################
+# Functions that turn the sort value and id of a card into a cursor and back. The value is stored as JSON so a number
+# stays a number, since SQLite sorts the number 5 and the text "5" differently
+# Parameters: the sort value and id (encode_cursor), or the cursor string (decode_cursor)
+# Returns: the cursor string (encode_cursor), or the (sort value, id) tuple (decode_cursor)
+# Raises: ValueError if the cursor wasn't made by encode_cursor
+#######################################################################################################################
+def encode_cursor(value, card_id):
+    text = json.dumps([value, card_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        value, card_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception as e:
+        raise ValueError("Invalid page cursor") from e
+    if not isinstance(card_id, int) or not isinstance(value, (str, int, float)):
+        raise ValueError("Invalid page cursor")
+    return value, card_id
+
+#######################################################################################################################
+# Function that loads one page of the library
+# Parameters: the key to sort by (see SORT_KEYS), "asc" or "desc" (None for the key's default), the cursor of the card
+#             the page starts after or the cursor of the card it ends before (at most one of them), and the page size
+# Returns: a dictionary of the page's "cards", the "next_cursor" and "prev_cursor" for the pages either side of it (None
+#          at either end of the library), and the "sort", "order" and "per_page" it was loaded with
+# Raises: ValueError for an unknown sort key or order, or an invalid cursor
+#######################################################################################################################
+def get_library_page(sort="name", order=None, after=None, before=None, per_page=PAGE_SIZE):
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key: {sort}")
+    order = order or DEFAULT_ORDERS.get(sort, "asc")
+    if order not in ("asc", "desc"):
+        raise ValueError(f"Unknown sort order: {order}")
+    per_page = max(1, min(per_page, MAX_PAGE_SIZE))
+    cursor = decode_cursor(before or after) if (before or after) else None
+
+    # a page going backwards is loaded in the opposite order starting from its last card, then flipped around
+    backwards = before is not None
+    descending = (order == "desc") != backwards
+    direction = "DESC" if descending else "ASC"
+    expression = SORT_KEYS[sort]
+
+    # one extra card is loaded to find out whether there's another page after this one
+    select = f"SELECT {', '.join(CARD_COLUMNS)}, {expression} FROM cards"
+    order_by = f"ORDER BY {expression} {direction}, id {direction} LIMIT ?"
+    limit = per_page + 1
+
+    _ensure_indexes()
+    with reading() as db:
+        if cursor is None:
+            db.execute(f"{select} {order_by}", (limit,))
+            rows = db.fetchall()
+        else:
+            # continue exactly where the cursor left off: first the rest of the cards sharing its sort value, then the
+            # cards after that value. SQLite can only seek an index on the first half of a (value, id) comparison, so
+            # as one comparison a page deep inside a big group of equal values (e.g. every LIGHT monster) would step
+            # through the whole group. Split in two, each query is a direct index seek
+            op = "<" if descending else ">"
+            db.execute(f"{select} WHERE {expression} = ? AND id {op} ? ORDER BY id {direction} LIMIT ?",
+                       (cursor[0], cursor[1], limit))
+            rows = db.fetchall()
+            if len(rows) < limit:
+                db.execute(f"{select} WHERE {expression} {op} ? {order_by}", (cursor[0], limit - len(rows)))
+                rows += db.fetchall()
+
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    cards = [dict(zip(CARD_COLUMNS, row)) for row in rows]
+    first = encode_cursor(rows[0][-1], rows[0][0]) if rows else None
+    last = encode_cursor(rows[-1][-1], rows[-1][0]) if rows else None
+
+    # a page reached from a cursor always has the card that cursor came from on its other side
+    if backwards:
+        next_cursor, prev_cursor = last, first if more else None
+    else:
+        next_cursor, prev_cursor = last if more else None, first if cursor is not None else None
+
+    return {
+        "cards": cards,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+        "sort": sort,
+        "order": order,
+        "per_page": per_page,
+    }
+
+#######################################################################################################################
+# Function that looks up a single card by its id, a primary key lookup
+# Parameters: the card's database id
+# Returns: the card dictionary, or None if there's no such card
+#######################################################################################################################
+def get_library_card(card_id):
+    with reading() as db:
+        db.execute(f"SELECT {', '.join(CARD_COLUMNS)} FROM cards WHERE id = ?", (card_id,))
+        row = db.fetchone()
+    return dict(zip(CARD_COLUMNS, row)) if row else None
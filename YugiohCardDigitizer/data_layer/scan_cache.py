@@ -0,0 +1,146 @@
+#####################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines a persistent cache of OCR results keyed by the SHA-256 of the scanned image, so
+#                         re-uploading the same photo returns instantly instead of re-running the whole pipeline
+#####################################################################################################################
+# Run this file directly to empty the cache: python -m YugiohCardDigitizer.data_layer.scan_cache clear
+
+import functools        # for computing the pipeline version only once per process
+import glob             # for finding every source file the pipeline depends on
+import hashlib          # for hashing image bytes and pipeline source code
+import json             # for storing result dictionaries as text
+import os               # for building file paths
+import sys              # for the command line entrypoint
+import time             # for tracking when each entry was last used
+
+from YugiohCardDigitizer.data_layer.database import writing
+
+BASE_DIR = os.path.dirname(__file__)                        # folder where scan_cache.py lives
+PROJECT_DIR = os.path.dirname(BASE_DIR)                     # the YugiohCardDigitizer folder
+db_details = os.path.join(BASE_DIR, "ScanCache.sqlite3")    # the cache lives next to Cards.sqlite3
+
+# bump this by hand to throw away every cached result, e.g. after changing tesseract itself or its language data
+PIPELINE_VERSION = "1"
+
+# the most results kept before the least recently used ones are evicted
+MAX_ENTRIES = 5000
+
+#######################################################################################################################
+# Function that works out the version of the OCR pipeline. Besides PIPELINE_VERSION it includes a hash of every file
+# the pipeline's output depends on, so editing a preprocessing step, an extractor, their constants, a template or the
+# card catalog invalidates the cache
+# Parameters: none
+# Returns: the version string stored alongside each cached result
+#######################################################################################################################
+@functools.lru_cache(maxsize=1)
+def pipeline_version():
+    digest = hashlib.sha256()
+    sources = (glob.glob(os.path.join(PROJECT_DIR, "preprocessing", "*.py"))
+               + glob.glob(os.path.join(PROJECT_DIR, "extractors", "*.py"))
+               + glob.glob(os.path.join(PROJECT_DIR, "attributes", "*.png"))
+               + [os.path.join(PROJECT_DIR, "tesseract.py"),
+                  # the known monster types and OCR fixes the extractors match against, and which stages are skipped
+                  os.path.join(PROJECT_DIR, "utils", "constants.py"),
+                  os.path.join(PROJECT_DIR, "utils", "stage_graph.py")])
+    # the card catalog changes which names OCR text is corrected to, but it's optional and can be swapped out
+    if os.path.exists(os.path.join(BASE_DIR, "cardinfo.json")):
+        sources.append(os.path.join(BASE_DIR, "cardinfo.json"))
+    for path in sorted(sources):
+        digest.update(os.path.relpath(path, PROJECT_DIR).encode())
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return f"{PIPELINE_VERSION}-{digest.hexdigest()[:16]}"
+
+#######################################################################################################################
+# Function that computes the content address of an image
+# Parameters: the raw bytes of the image file
+# Returns: the SHA-256 of the bytes as a hex string
+#######################################################################################################################
+def image_digest(image_bytes):
+    return hashlib.sha256(image_bytes).hexdigest()
+
+#######################################################################################################################
+# Function that computes the content address of an image file on disk without reading it all into memory at once
+# Parameters: the filepath of the image
+# Returns: the SHA-256 of the file as a hex string
+#######################################################################################################################
+def file_digest(image_path):
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+#######################################################################################################################
+# Function that creates the cache table if needed and removes results made by any other version of the pipeline
+# Parameters: none
+# Returns: void
+#######################################################################################################################
+@functools.lru_cache(maxsize=1)
+def _ensure_table():
+    with writing(db_details) as db:
+        db.execute("""create table if not exists scan_cache (
+                image_hash char(64) not null,
+                pipeline_version varchar(64) not null,
+                result text not null,
+                created_at real not null,
+                last_used real not null,
+                primary key (image_hash, pipeline_version)
+            )""")
+        db.execute("create index if not exists scan_cache_last_used on scan_cache (last_used)")
+        db.execute("DELETE FROM scan_cache WHERE pipeline_version != ?", (pipeline_version(),))
+
+#######################################################################################################################
+# Function that looks up a cached OCR result and marks it as recently used
+# Parameters: the image's SHA-256 hex digest
+# Returns: the cached result dictionary, or None on a cache miss
+#######################################################################################################################
+def get_cached_scan(image_hash):
+    _ensure_table()
+    with writing(db_details) as db:
+        db.execute("UPDATE scan_cache SET last_used = ? WHERE image_hash = ? AND pipeline_version = ?",
+                   (time.time(), image_hash, pipeline_version()))
+        db.execute("SELECT result FROM scan_cache WHERE image_hash = ? AND pipeline_version = ?",
+                   (image_hash, pipeline_version()))
+        row = db.fetchone()
+    return json.loads(row[0]) if row else None
+
+#######################################################################################################################
+# Function that saves an OCR result and evicts the least recently used results if the cache is over its size limit
+# Parameters: the image's SHA-256 hex digest and the result dictionary returned by process_yugioh_card
+# Returns: void
+#######################################################################################################################
+def store_scan(image_hash, result):
+    _ensure_table()
+    now = time.time()
+    with writing(db_details) as db:
+        db.execute("""
+            INSERT OR REPLACE INTO scan_cache (image_hash, pipeline_version, result, created_at, last_used)
+            VALUES (?, ?, ?, ?, ?)
+        """, (image_hash, pipeline_version(), json.dumps(result), now, now))
+        db.execute("""
+            DELETE FROM scan_cache WHERE rowid IN (
+                SELECT rowid FROM scan_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        """, (MAX_ENTRIES,))
+
+#######################################################################################################################
+# Function that empties the whole cache
+# Parameters: none
+# Returns: the number of results removed
+#######################################################################################################################
+def clear_cache():
+    _ensure_table()
+    with writing(db_details) as db:
+        db.execute("DELETE FROM scan_cache")
+        return db.rowcount
+
+# if the file is run directly, clear the cache
+if __name__ == "__main__":
+    if sys.argv[1:] != ["clear"]:
+        print("usage: python -m YugiohCardDigitizer.data_layer.scan_cache clear")
+        sys.exit(1)
+    print(f"Removed {clear_cache()} cached scan(s).")
@@ -0,0 +1,199 @@
+#####################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines the table that tracks every scan submitted from the web app, so a scan can run in
+#                         the background while the browser polls for its status
+#####################################################################################################################
+
+import functools        # for creating the table only once per process
+import json             # for storing result dictionaries as text
+import os               # for building file paths
+import threading        # for the heartbeat that marks this process's jobs as still alive
+import time             # for stamping when each job was created and updated
+import uuid             # for giving each job a unique id
+
+from YugiohCardDigitizer.data_layer.database import reading, writing
+
+BASE_DIR = os.path.dirname(__file__)                        # folder where scan_jobs.py lives
+db_details = os.path.join(BASE_DIR, "ScanJobs.sqlite3")     # the jobs live next to Cards.sqlite3
+
+# the states a job moves through. A job ends as either done or failed
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# how long a finished job's result is kept around for the user to come back to
+JOB_RETENTION_SECONDS = 24 * 60 * 60
+
+# how often a process touches the jobs it's still working on, and how long a job can go untouched before it's taken to
+# be abandoned (the process running it was stopped or crashed). Any number of app processes and scripts can share the
+# table, so a job is only failed once the process that owns it has stopped touching it
+HEARTBEAT_SECONDS = 30
+ABANDONED_SECONDS = 4 * HEARTBEAT_SECONDS
+
+ABANDONED_ERROR = "The app was stopped before this scan finished."
+
+_owner = uuid.uuid4().hex       # identifies the jobs this process runs
+_heartbeat = None               # the thread touching them, started with the first job
+_heartbeat_lock = threading.Lock()
+
+#######################################################################################################################
+# Function that creates the jobs table if needed. Tables from before jobs had an owner get the column added
+# Parameters: none
+# Returns: void
+#######################################################################################################################
+@functools.lru_cache(maxsize=1)
+def _ensure_table():
+    with writing(db_details) as db:
+        db.execute("""create table if not exists scan_jobs (
+                job_id char(32) primary key,
+                status varchar(10) not null,
+                image_filename text not null,
+                result text,
+                error text,
+                created_at real not null,
+                updated_at real not null,
+                owner char(32)
+            )""")
+        db.execute("PRAGMA table_info(scan_jobs)")
+        if "owner" not in {row[1] for row in db.fetchall()}:
+            db.execute("ALTER TABLE scan_jobs ADD COLUMN owner char(32)")
+
+#######################################################################################################################
+# Function that fails every unfinished job whose owner has stopped touching it
+# Parameters: an open database cursor and the current time
+# Returns: void
+#######################################################################################################################
+def _fail_abandoned_jobs(db, now):
+    db.execute("""
+        UPDATE scan_jobs SET status = ?, error = ?, updated_at = ?
+        WHERE status IN (?, ?) AND updated_at < ?
+    """, (FAILED, ABANDONED_ERROR, now, QUEUED, RUNNING, now - ABANDONED_SECONDS))
+
+#######################################################################################################################
+# Function that touches every unfinished job this process owns, every HEARTBEAT_SECONDS, for as long as it runs. Jobs
+# abandoned by other processes are failed at the same time
+# Parameters: none
+# Returns: void
+#######################################################################################################################
+def _heartbeat_loop():
+    while True:
+        time.sleep(HEARTBEAT_SECONDS)
+        try:
+            now = time.time()
+            with writing(db_details) as db:
+                db.execute("UPDATE scan_jobs SET updated_at = ? WHERE owner = ? AND status IN (?, ?)",
+                           (now, _owner, QUEUED, RUNNING))
+                _fail_abandoned_jobs(db, now)
+        except Exception as e:
+            print("SCAN JOB HEARTBEAT ERROR:", e)
+
+def _start_heartbeat():
+    global _heartbeat
+    with _heartbeat_lock:
+        if _heartbeat is None:
+            _heartbeat = threading.Thread(target=_heartbeat_loop, name="scan-job-heartbeat", daemon=True)
+            _heartbeat.start()
+
+#######################################################################################################################
+# Function that gives a forked child process its own owner id and heartbeat. The parent's thread doesn't exist in the
+# child, and the parent's jobs are still the parent's
+#######################################################################################################################
+def _reset_owner():
+    global _owner, _heartbeat, _heartbeat_lock
+    _owner = uuid.uuid4().hex
+    _heartbeat = None
+    _heartbeat_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_owner)
+
+#######################################################################################################################
+# Function that converts a row of the jobs table into a dictionary. An unfinished job that has gone untouched for
+# ABANDONED_SECONDS is reported as failed, even before create_job or a heartbeat gets round to saving it as failed
+# Parameters: the row tuple and the current time
+# Returns: a dictionary of the job's fields, with the result decoded back into a card dictionary
+#######################################################################################################################
+def _row_to_job(row, now):
+    job = {
+        "job_id": row[0],
+        "status": row[1],
+        "image_filename": row[2],
+        "result": json.loads(row[3]) if row[3] else None,
+        "error": row[4],
+        "created_at": row[5],
+        "updated_at": row[6],
+    }
+    if job["status"] in (QUEUED, RUNNING) and job["updated_at"] < now - ABANDONED_SECONDS:
+        job["status"], job["error"] = FAILED, ABANDONED_ERROR
+    return job
+
+#######################################################################################################################
+# Function that records a new scan waiting to be run by this process. Jobs older than JOB_RETENTION_SECONDS are
+# removed at the same time
+# Parameters: the filename of the uploaded image
+# Returns: the new job's id
+#######################################################################################################################
+def create_job(image_filename):
+    _ensure_table()
+    _start_heartbeat()
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with writing(db_details) as db:
+        db.execute("DELETE FROM scan_jobs WHERE updated_at < ?", (now - JOB_RETENTION_SECONDS,))
+        _fail_abandoned_jobs(db, now)
+        db.execute("""
+            INSERT INTO scan_jobs (job_id, status, image_filename, created_at, updated_at, owner)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (job_id, QUEUED, image_filename, now, now, _owner))
+    return job_id
+
+#######################################################################################################################
+# Functions that move a job to its next state
+# Parameters: the job's id, and the card dictionary (mark_done) or error message (mark_failed)
+# Returns: void
+#######################################################################################################################
+def mark_running(job_id):
+    _update_job(job_id, RUNNING)
+
+def mark_done(job_id, result):
+    _update_job(job_id, DONE, result=json.dumps(result))
+
+def mark_failed(job_id, error):
+    _update_job(job_id, FAILED, error=error)
+
+def _update_job(job_id, status, result=None, error=None):
+    _ensure_table()
+    with writing(db_details) as db:
+        db.execute("UPDATE scan_jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                   (status, result, error, time.time(), job_id))
+
+#######################################################################################################################
+# Function that looks up jobs by their ids. It only reads, so pages polling their jobs never wait on the scans' writes.
+# Abandoned jobs come back as failed, so a page polling one stops waiting
+# Parameters: an iterable of job ids
+# Returns: a list of job dictionaries in the order the ids were given. Unknown ids are left out
+#######################################################################################################################
+def get_jobs(job_ids):
+    job_ids = list(dict.fromkeys(job_ids))
+    if not job_ids:
+        return []
+    _ensure_table()
+    now = time.time()
+    with reading(db_details) as db:
+        placeholders = ", ".join("?" * len(job_ids))
+        db.execute(f"""
+            SELECT job_id, status, image_filename, result, error, created_at, updated_at
+            FROM scan_jobs WHERE job_id IN ({placeholders})
+        """, job_ids)
+        jobs = {row[0]: _row_to_job(row, now) for row in db.fetchall()}
+    return [jobs[job_id] for job_id in job_ids if job_id in jobs]
+
+#######################################################################################################################
+# Function that looks up a single job
+# Parameters: the job's id
+# Returns: the job dictionary, or None if there's no such job
+#######################################################################################################################
+def get_job(job_id):
+    jobs = get_jobs([job_id])
+    return jobs[0] if jobs else None
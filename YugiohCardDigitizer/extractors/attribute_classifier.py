@@ -7,52 +7,114 @@
 #######################################################################################################################
 
 import os
+import threading
 import numpy as np
 from PIL import Image
 from YugiohCardDigitizer.preprocessing.preprocess_attribute import preprocess_attr_for_match
 
+# template banks already built in this process, keyed by the absolute path of their template folder
+_TEMPLATE_BANKS = {}
+_TEMPLATE_BANKS_LOCK = threading.Lock()
 
 #######################################################################################################################
-# Function that attempts to match a scanned card's attribute with base images in the "attributes" folder
-# Parameters: the cropped attribute image and directory containing template images to compare
-# Returns: the best match found
+# Function that standardizes an image array. New value = (pixel - mean_of_image) / standard_deviation
+# removes differences in lighting, brightness, and contrast to make the image more comparable
+# Parameters: a preprocessed image
+# Returns: the image as a flat, standardized float32 numpy array
 #######################################################################################################################
-def classify_attribute(cropped_attr_img, template_dir="attributes"):
-    """Classify attribute icon using normalized correlation instead of histogram distance."""
-    # Preprocess the cropped icon exactly like the templates for better matching
-    img = preprocess_attr_for_match(cropped_attr_img)
+def _standardize(img):
+    arr = np.asarray(img, dtype=np.float32).ravel()
+    return (arr - arr.mean()) / (arr.std() + 1e-6)
+
+#######################################################################################################################
+# Class holding every attribute template preprocessed, standardized, and stacked into one matrix (one row each) so
+# a query icon can be scored against all templates with a single matrix product
+#######################################################################################################################
+class AttributeTemplateBank:
+    def __init__(self, template_dir, signature):
+        self.template_dir = template_dir
+        self.signature = signature  # the folder state this bank was built from
+        self.labels = []
+        rows = []
+
+        for filename in sorted(os.listdir(template_dir)):
+            # safety code in case an unknown file extension is inside the directory of samples
+            if not filename.lower().endswith(".png"):
+                continue
 
-    # convert the image to a numpy array for mathematical operations can be applied to it, ensuring consistent fp format
-    img_arr = np.array(img, dtype=np.float32)
+            # open sample image, preprocess, and standardize. The label comes from the filename
+            with Image.open(os.path.join(template_dir, filename)) as template:
+                rows.append(_standardize(preprocess_attr_for_match(template)))
+            self.labels.append(filename.split(".")[0].upper())
 
-    # standardize the image. New value = (pixel - mean_of_image) / standard_deviation
-    # removes differences in lighting, brightness, and contrast to make the image more comparable
-    img_arr = (img_arr - img_arr.mean()) / (img_arr.std() + 1e-6)
+        # divide by the pixel count up front so the matrix product directly gives mean(img * template) per template
+        self.matrix = np.stack(rows) / rows[0].size if rows else np.empty((0, 0), dtype=np.float32)
 
-    # define variables to store the best matching label and matching score found
-    best_match = None
-    best_score = -1.0
+    # scores one standardized icon (1-D) or a batch of them (2-D, one per row) against every template
+    # returns an array of shape (templates,) or (icons, templates)
+    def score(self, standardized):
+        return standardized @ self.matrix.T
+
+    # returns the best matching label for every row of a standardized batch
+    def best_labels(self, standardized_batch):
+        if not self.labels:
+            return [None] * len(standardized_batch)
+        best = np.argmax(self.score(standardized_batch), axis=1)
+        return [self.labels[i] for i in best]
+
+#######################################################################################################################
+# Function that describes the current state of a template folder so changes to it can be detected cheaply
+# Parameters: the directory containing template images
+# Returns: a tuple of (filename, modified time, size) for every png in the folder
+#######################################################################################################################
+def _template_signature(template_dir):
+    with os.scandir(template_dir) as entries:
+        return tuple(sorted(
+            (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+            for entry in entries if entry.name.lower().endswith(".png")
+        ))
 
-    for filename in os.listdir(template_dir):
-        # safety code in case an unknown file extension is inside the directory of samples
-        if not filename.lower().endswith(".png"):
-            continue
+#######################################################################################################################
+# Function that returns the template bank for a folder, building it on first use and rebuilding only if the folder's
+# contents have changed since it was last built
+# Parameters: the directory containing template images
+# Returns: an AttributeTemplateBank
+#######################################################################################################################
+def load_template_bank(template_dir="attributes"):
+    key = os.path.abspath(template_dir)
+    signature = _template_signature(key)
 
-        label = filename.split(".")[0].upper() # get the attribute label from filename
+    with _TEMPLATE_BANKS_LOCK:
+        bank = _TEMPLATE_BANKS.get(key)
+        if bank is None or bank.signature != signature:
+            bank = AttributeTemplateBank(key, signature)
+            _TEMPLATE_BANKS[key] = bank
+    return bank
 
-        # open sample image, preprocess, convert to numpy array, and standardize
-        template = Image.open(os.path.join(template_dir, filename))
-        template = preprocess_attr_for_match(template)
-        template_arr = np.array(template, dtype=np.float32)
-        template_arr = (template_arr - template_arr.mean()) / (template_arr.std() + 1e-6)
+#######################################################################################################################
+# Function that attempts to match a scanned card's attribute with base images in the "attributes" folder
+# Parameters: the cropped attribute image and directory containing template images to compare
+# Returns: the best match found
+#######################################################################################################################
+def classify_attribute(cropped_attr_img, template_dir="attributes"):
+    """Classify attribute icon using normalized correlation instead of histogram distance."""
+    return classify_attributes([cropped_attr_img], template_dir)[0]
 
-        # calculate similarity score by multiplying the image arrays pixel by pixel and calculating the average
-        # since arrays are same size after processing, this creates a similarity map of the pixels
-        score = np.mean(img_arr * template_arr)
+#######################################################################################################################
+# Function that matches a batch of cropped attribute icons against the templates in one vectorized product
+# Parameters: a list of cropped attribute images and directory containing template images to compare
+# Returns: a list with the best match found for each image (empty for an empty batch)
+#######################################################################################################################
+def classify_attributes(cropped_attr_imgs, template_dir="attributes"):
+    cropped_attr_imgs = list(cropped_attr_imgs)
+    if not cropped_attr_imgs:
+        return [] # np.stack can't stack nothing
+    bank = load_template_bank(template_dir)
 
-        # if the similarity score is higher than the last iteration, replace the high score and winning label
-        if score > best_score:
-            best_score = score
-            best_match = label
+    # Preprocess each cropped icon exactly like the templates for better matching, then standardize it
+    # since every processed icon is the same size, the batch stacks into one (icons x pixels) matrix
+    batch = np.stack([_standardize(preprocess_attr_for_match(img)) for img in cropped_attr_imgs])
 
-    return best_match
\ No newline at end of file
+    # the similarity score is the mean of the pixel-by-pixel product of icon and template, which is exactly what
+    # the (icons x pixels) @ (pixels x templates) product computes for every pair at once
+    return bank.best_labels(batch)
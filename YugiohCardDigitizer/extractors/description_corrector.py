@@ -0,0 +1,197 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines a spelling corrector for a card's description that fixes each word OCR misread to
+#                         the closest word used in real card text, using a precomputed index of deleted characters
+#######################################################################################################################
+# How the index works (the SymSpell approach): every vocabulary word is stored under each string that can be made by
+# deleting up to MAX_EDIT_DISTANCE of its characters. Two words within that many edits of each other always share one
+# of those strings, so correcting a word only takes hash lookups of its own deletes instead of comparing it against
+# the whole vocabulary
+
+import os
+import re
+import threading
+from collections import Counter
+from YugiohCardDigitizer.data_layer.catalog import CATALOG_PATH, catalog_signature, load_catalog
+
+# the most character edits (insert, delete, replace or swap two neighbors) a word is corrected by
+MAX_EDIT_DISTANCE = 2
+
+# only the start of a long word is used for its deletes. This keeps the index small while long words, which are
+# rarely close to each other, still match. The full word is always compared before a correction is accepted
+PREFIX_LENGTH = 7
+
+# the shortest word that's ever corrected. A short misread is only an edit or two from many real words (e.g. "lift"
+# and "life"), so short words are left as OCR read them
+MIN_CORRECTION_LENGTH = 5
+
+# the fewest different words a catalog must use before descriptions are corrected against it. The catalog included
+# with the project only lists the sample cards, and against a vocabulary that small valid English that just isn't in
+# it would be "corrected" into whatever word is closest
+MIN_VOCABULARY_SIZE = 2000
+
+# what counts as a word in card text. A digit inside a word is kept with it since it's usually a misread letter
+# (e.g. "contro1s"). Numbers on their own and punctuation are left exactly as OCR read them
+WORD_PATTERN = re.compile(r"[A-Za-z0-9]*[A-Za-z][A-Za-z0-9]*(?:'[A-Za-z]+)?")
+
+# spell indexes already built in this process, keyed by the absolute path of their catalog
+_SPELL_INDEXES = {}
+_SPELL_INDEXES_LOCK = threading.Lock()
+
+#######################################################################################################################
+# Function that works out how many edits a word of a given length may be corrected by. Short words are only a couple
+# of edits away from lots of other words, so they're allowed fewer
+# Parameters: the length of the word
+# Returns: the allowed edit distance
+#######################################################################################################################
+def allowed_distance(length):
+    if length <= 2:
+        return 0
+    if length <= 5:
+        return min(1, MAX_EDIT_DISTANCE)
+    return MAX_EDIT_DISTANCE
+
+#######################################################################################################################
+# Function that generates every string made by deleting up to max_distance characters from a word
+# Parameters: the word and the most characters to delete
+# Returns: a set of strings, including the word itself
+#######################################################################################################################
+def _deletes(word, max_distance):
+    results = {word}
+    edge = {word}
+    for _ in range(max_distance):
+        edge = {w[:i] + w[i + 1:] for w in edge for i in range(len(w))} - results
+        results |= edge
+    return results
+
+#######################################################################################################################
+# Function that counts the edits between two words (optimal string alignment distance), giving up early once the
+# count can no longer stay within a limit
+# Parameters: the two words and the limit
+# Returns: the number of edits, or limit + 1 if it's over the limit
+#######################################################################################################################
+def edit_distance(a, b, limit):
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            # two neighboring characters swapped counts as one edit
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+#######################################################################################################################
+# Class holding the vocabulary of card text (with how often each word is used) and the index of its deletes
+#######################################################################################################################
+class SpellIndex:
+    def __init__(self, texts, signature=None):
+        self.signature = signature  # the catalog state this index was built from
+        surface_forms = Counter()
+        for text in texts:
+            surface_forms.update(WORD_PATTERN.findall(text))
+
+        # words are matched in lowercase. Each one remembers its most common spelling so words like ATK, GY or DARK
+        # come back in capitals
+        self.counts = Counter()
+        self.canonical = {}
+        for form, count in surface_forms.most_common():
+            word = form.lower()
+            self.counts[word] += count
+            self.canonical.setdefault(word, form)
+
+        self._deletes = {}
+        for word in self.counts:
+            for deleted in _deletes(word[:PREFIX_LENGTH], allowed_distance(len(word))):
+                self._deletes.setdefault(deleted, []).append(word)
+
+    def __len__(self):
+        return len(self.counts)
+
+    # finds the closest vocabulary word to a lowercase word
+    # returns the vocabulary word, or None if nothing is within the allowed distance. Words too short to fix, and
+    # every word when the vocabulary is too small to trust, only match themselves
+    def lookup(self, word):
+        if word in self.counts:
+            return word
+        if len(word) < MIN_CORRECTION_LENGTH or len(self) < MIN_VOCABULARY_SIZE:
+            return None
+        max_distance = allowed_distance(len(word))
+        if max_distance == 0:
+            return None
+
+        best, best_key = None, None
+        seen = set()
+        for deleted in _deletes(word[:PREFIX_LENGTH], max_distance):
+            for candidate in self._deletes.get(deleted, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                distance = edit_distance(word, candidate, max_distance)
+                if distance > max_distance:
+                    continue
+                # fewest edits wins, then the more common word
+                key = (distance, -self.counts[candidate])
+                if best_key is None or key < best_key:
+                    best, best_key = candidate, key
+        return best
+
+    # corrects one word of OCR text, keeping its capitalization
+    # returns the corrected word, or the original word if nothing is close. Short words like LP, GY or I are real
+    # card text whether or not the catalog uses them, so a word is never dropped. Noise OCR wasn't sure of has
+    # already been left out by its confidence
+    def correct_word(self, token):
+        match = self.lookup(token.lower())
+        if match is None:
+            return token
+
+        # an all-caps word stays in caps and a word whose first letter was fixed takes the vocabulary's spelling.
+        # Otherwise words the vocabulary always writes with capitals inside (ATK, GY) use those, and the rest keep
+        # OCR's capitalization of the first letter
+        canonical = self.canonical[match]
+        if len(token) > 1 and token.isupper():
+            return match.upper()
+        if token[0].lower() != match[0] or canonical[1:] != canonical[1:].lower():
+            return canonical
+        if token[0].isupper():
+            return match.capitalize()
+        return match
+
+    # corrects every word in a piece of text, leaving numbers, punctuation and spacing untouched
+    def correct_text(self, text):
+        return WORD_PATTERN.sub(lambda m: self.correct_word(m.group()), text)
+
+#######################################################################################################################
+# Function that returns the spell index for a catalog, building it from every card description on first use and
+# rebuilding only if the catalog file has changed since it was last built
+# Parameters: the filepath of the catalog
+# Returns: a SpellIndex (empty if there's no catalog)
+#######################################################################################################################
+def get_spell_index(catalog_path=CATALOG_PATH):
+    key = os.path.abspath(catalog_path)
+    signature = catalog_signature(key)
+
+    with _SPELL_INDEXES_LOCK:
+        index = _SPELL_INDEXES.get(key)
+        if index is None or index.signature != signature:
+            index = SpellIndex((card.get("desc", "") for card in load_catalog(key)), signature)
+            _SPELL_INDEXES[key] = index
+    return index
+
+#######################################################################################################################
+# Function that corrects the words of a card's description read by OCR
+# Parameters: the raw description text
+# Returns: the corrected description text
+#######################################################################################################################
+def correct_description(raw):
+    return get_spell_index().correct_text(raw)
@@ -1,10 +1,14 @@
+import re
+from YugiohCardDigitizer.extractors.name_index import get_name_index
+
+# the lowest confidence at which the OCR'd name is replaced by the closest name in the card catalog
+NAME_MATCH_THRESHOLD = 0.6
+
 #######################################################################################################################
 # Function that cleans up and fixes common character misreads by ocr for a card's name
 # Parameters: the raw string for the card's name
 # Returns: a cleaned and standard format for the name as a string
 #######################################################################################################################
-import re
-
 def correct_chars_for_name(raw):
     cleaned_string = raw.upper()  # first, uppercase everything
 
@@ -18,4 +22,16 @@ def correct_chars_for_name(raw):
     cleaned_string = re.sub(r"[^A-Z0-9\s\-]", "", cleaned_string) # allow letters, numbers, spaces, hyphens
     cleaned_string = re.sub(r"\s{2,}", " ", cleaned_string).strip() # collapse multiple spaces
     cleaned_string = " ".join(w.capitalize() for w in cleaned_string.split()) # capitalize each word
-    return cleaned_string
\ No newline at end of file
+    return cleaned_string
+
+#######################################################################################################################
+# Function that corrects a card's name to the closest real card name in the catalog (data_layer/cardinfo.json)
+# Parameters: the raw string for the card's name and the lowest confidence a catalog match is trusted at
+# Returns: a tuple of the name and the catalog match's confidence from 0 to 1. If no catalog name is close enough the
+#          name is the cleaned OCR text instead
+#######################################################################################################################
+def match_catalog_name(raw, min_confidence=NAME_MATCH_THRESHOLD):
+    name, confidence = get_name_index().lookup(raw)
+    if name is None or confidence < min_confidence:
+        return correct_chars_for_name(raw), confidence
+    return name, confidence
@@ -0,0 +1,132 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines a trigram index over every card name in the catalog, so the name read by OCR can
+#                         be corrected to the closest real card name without comparing it to every name one by one
+#######################################################################################################################
+
+import os
+import re
+import threading
+from difflib import SequenceMatcher
+import numpy as np
+from YugiohCardDigitizer.data_layer.catalog import CATALOG_PATH, catalog_signature, load_catalog
+
+# how many of the names sharing the most trigrams with the query are re-scored with a full string comparison
+CANDIDATES = 8
+
+# the same misreads fixed by correct_chars_for_name. They're applied to catalog names too so both sides agree
+_CHAR_FIXES = str.maketrans({'0': 'O', '1': 'I', '5': 'S', '6': 'G', '8': 'B', '|': 'I', '¢': 'C'})
+
+# name indexes already built in this process, keyed by the absolute path of their catalog
+_NAME_INDEXES = {}
+_NAME_INDEXES_LOCK = threading.Lock()
+
+#######################################################################################################################
+# Function that reduces a name to the form that is indexed: uppercase letters and digits separated by single spaces
+# Parameters: a card name or raw OCR text
+# Returns: the normalized name as a string
+#######################################################################################################################
+def normalize_name(text):
+    text = text.upper().translate(_CHAR_FIXES)
+    return " ".join(re.sub(r"[^A-Z0-9]+", " ", text).split())
+
+#######################################################################################################################
+# Function that splits a normalized name into its set of 3-character pieces. The name is padded with spaces so the
+# start and end of every word get pieces of their own
+# Parameters: a normalized name
+# Returns: a set of trigram strings
+#######################################################################################################################
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+#######################################################################################################################
+# Class holding an inverted index from each trigram to the ids of the catalog names that contain it. A lookup only
+# touches the names that share at least one trigram with the query, then re-scores the best few candidates
+#######################################################################################################################
+class NameIndex:
+    def __init__(self, names, signature=None):
+        self.signature = signature  # the catalog state this index was built from
+        self.names = list(dict.fromkeys(names))
+        self.keys = [normalize_name(name) for name in self.names]
+        self._exact = {}
+        postings = {}
+        gram_counts = []
+
+        for name_id, key in enumerate(self.keys):
+            self._exact.setdefault(key, name_id)
+            grams = _trigrams(key)
+            gram_counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(name_id)
+
+        # numpy arrays let a lookup count shared trigrams for every matching name with one bincount
+        self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self._gram_counts = np.array(gram_counts, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.names)
+
+    # finds the catalog name closest to some OCR text
+    # returns (name, confidence from 0 to 1), or (None, 0.0) if no catalog name shares anything with the text
+    def lookup(self, text, candidates=CANDIDATES):
+        key = normalize_name(text)
+        if not key or not self.names:
+            return None, 0.0
+
+        exact = self._exact.get(key)
+        if exact is not None:
+            return self.names[exact], 1.0
+
+        grams = _trigrams(key)
+        hits = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not hits:
+            return None, 0.0
+
+        # Dice coefficient of the trigram sets: 2 * shared / (query trigrams + name trigrams), only computed for the
+        # names that share at least one trigram
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.names))
+        matched = np.flatnonzero(shared)
+        dice = 2.0 * shared[matched] / (len(grams) + self._gram_counts[matched])
+        if len(matched) > candidates:
+            top = np.argpartition(dice, -candidates)[-candidates:]
+        else:
+            top = np.arange(len(matched))
+
+        # trigram overlap narrows the field. The character-level ratio decides the winner and is the confidence.
+        # The query is the matcher's second sequence because that's the one it pre-processes, so it's done only once
+        matcher = SequenceMatcher(None, autojunk=False)
+        matcher.set_seq2(key)
+        best_id, best_score = None, 0.0
+        for i in top[np.argsort(-dice[top], kind="stable")]:
+            name_id = int(matched[i])
+            matcher.set_seq1(self.keys[name_id])
+            # the cheap upper bound skips names that can't beat the best so far
+            if matcher.real_quick_ratio() <= best_score or matcher.quick_ratio() <= best_score:
+                continue
+            score = matcher.ratio()
+            if score > best_score:
+                best_id, best_score = name_id, score
+        if best_id is None:
+            return None, 0.0
+        return self.names[best_id], best_score
+
+#######################################################################################################################
+# Function that returns the name index for a catalog, building it on first use and rebuilding only if the catalog
+# file has changed since it was last built
+# Parameters: the filepath of the catalog
+# Returns: a NameIndex (empty if there's no catalog)
+#######################################################################################################################
+def get_name_index(catalog_path=CATALOG_PATH):
+    key = os.path.abspath(catalog_path)
+    signature = catalog_signature(key)
+
+    with _NAME_INDEXES_LOCK:
+        index = _NAME_INDEXES.get(key)
+        if index is None or index.signature != signature:
+            index = NameIndex((card["name"] for card in load_catalog(key)), signature)
+            _NAME_INDEXES[key] = index
+    return index
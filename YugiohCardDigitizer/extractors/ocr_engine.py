@@ -0,0 +1,211 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines a bounded pool of warm, reusable OCR engines so tesseract's language model is loaded
+#                         once per engine instead of once per region of every card
+#######################################################################################################################
+
+import os
+import queue
+import shlex
+import threading
+from contextlib import contextmanager
+
+import pytesseract
+
+# tesserocr is the in-process binding to the tesseract library the engines are built on, and is a requirement (see
+# the README). Each engine keeps its model loaded between calls. Without it the app still runs, falling back to
+# pytesseract, which starts a new tesseract process and loads the model again for every single call
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# the column names tesseract writes at the top of its TSV output. tesserocr leaves them off, so we add them back
+TSV_HEADER = "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext"
+
+#######################################################################################################################
+# Function that splits a tesseract command line style config string into its parts
+# Parameters: a config string such as "--oem 3 --psm 7 -c tessedit_char_whitelist=ABC"
+# Returns: the page segmentation mode (or None) and a dictionary of the -c variables
+#######################################################################################################################
+def parse_config(config):
+    psm = None
+    variables = {}
+    tokens = shlex.split(config or "")
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token == "--psm" and index + 1 < len(tokens):
+            psm = int(tokens[index + 1])
+            index += 1
+        elif token == "-c" and index + 1 < len(tokens) and "=" in tokens[index + 1]:
+            name, value = tokens[index + 1].split("=", 1)
+            variables[name] = value
+            index += 1
+        # --oem is fixed when an engine is created (every caller uses the default engine mode), so it's skipped here
+        elif token == "--oem":
+            index += 1
+        index += 1
+    return psm, variables
+
+#######################################################################################################################
+# Class for an engine that runs tesseract in-process through tesserocr. The model stays loaded for the engine's life
+#######################################################################################################################
+class TesserocrEngine:
+    def __init__(self, lang="eng", tessdata_path=None):
+        kwargs = {"lang": lang}
+        if tessdata_path:
+            kwargs["path"] = tessdata_path
+        self.api = tesserocr.PyTessBaseAPI(**kwargs)
+
+    # applies a config for the duration of one call, then puts every changed setting back the way it was
+    @contextmanager
+    def configured(self, config):
+        psm, variables = parse_config(config)
+        previous_psm = self.api.GetPageSegMode()
+        previous_vars = {name: self.api.GetVariableAsString(name) for name in variables}
+        if psm is not None:
+            self.api.SetPageSegMode(psm)
+        for name, value in variables.items():
+            self.api.SetVariable(name, value)
+        try:
+            yield self
+        finally:
+            self.api.SetPageSegMode(previous_psm)
+            for name, value in previous_vars.items():
+                self.api.SetVariable(name, value or "")
+
+    # returns the same dictionary pytesseract.image_to_data(output_type=DICT) would
+    def image_to_data(self, img):
+        self.api.SetImage(img)
+        tsv = self.api.GetTSVText(0)
+        return pytesseract.pytesseract.file_to_dict(TSV_HEADER + "\n" + tsv, "\t", -1)
+
+    def image_to_string(self, img):
+        self.api.SetImage(img)
+        return self.api.GetUTF8Text()
+
+    def close(self):
+        self.api.End()
+
+#######################################################################################################################
+# Class for the fallback engine used when tesserocr isn't installed. It simply hands each call to pytesseract, so it
+# isn't warm: every call still starts a tesseract process, and the pool only limits how many run at once
+#######################################################################################################################
+class PytesseractEngine:
+    def __init__(self, lang="eng"):
+        self.lang = lang
+        self.config = ""
+
+    @contextmanager
+    def configured(self, config):
+        self.config = config
+        try:
+            yield self
+        finally:
+            self.config = ""
+
+    def image_to_data(self, img):
+        return pytesseract.image_to_data(img, lang=self.lang, output_type=pytesseract.Output.DICT, config=self.config)
+
+    def image_to_string(self, img):
+        return pytesseract.image_to_string(img, lang=self.lang, config=self.config)
+
+    def close(self):
+        pass
+
+#######################################################################################################################
+# Class for a bounded pool of OCR engines. Engines are created lazily, handed out one caller at a time, and returned
+# to the pool afterwards so the next caller gets an engine that's already warm
+#######################################################################################################################
+class OcrEnginePool:
+    def __init__(self, max_engines=None, lang="eng", tessdata_path=None):
+        self.max_engines = max_engines or os.cpu_count() or 1
+        self.lang = lang
+        self.tessdata_path = tessdata_path
+        self._idle = queue.LifoQueue()  # LIFO so the most recently used (hottest) engine is reused first
+        self._slots = threading.BoundedSemaphore(self.max_engines)
+
+    def _create_engine(self):
+        if tesserocr is not None:
+            return TesserocrEngine(self.lang, self.tessdata_path)
+        _warn_no_tesserocr()
+        return PytesseractEngine(self.lang)
+
+    # checks an engine out of the pool configured for one call. Blocks while every engine is busy
+    @contextmanager
+    def engine(self, config=""):
+        with self._slots:
+            try:
+                engine = self._idle.get_nowait()
+            except queue.Empty:
+                engine = self._create_engine()
+
+            try:
+                with engine.configured(config):
+                    yield engine
+            except Exception:
+                # an engine that failed mid-call may be in a bad state, so throw it away instead of reusing it
+                engine.close()
+                raise
+            self._idle.put(engine)
+
+    # shuts down every idle engine
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+# the fallback is much slower, so it's pointed out once per process
+_warned_no_tesserocr = False
+
+def _warn_no_tesserocr():
+    global _warned_no_tesserocr
+    if not _warned_no_tesserocr:
+        _warned_no_tesserocr = True
+        print("WARNING: tesserocr isn't installed, so every OCR call starts a new tesseract process. "
+              "Install it (see the README) for warm, reusable OCR engines.")
+
+# the process-wide pool, created the first time it's needed
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+#######################################################################################################################
+# Function that finds the tessdata folder next to a tesseract executable installed in its default Windows location
+# Parameters: none
+# Returns: the tessdata path if it exists, otherwise None so tesserocr uses its compiled-in default
+#######################################################################################################################
+def _default_tessdata_path():
+    from YugiohCardDigitizer.utils.install_tesseract import TESSERACT_EXE
+    path = os.path.join(os.path.dirname(TESSERACT_EXE), "tessdata")
+    return path if os.path.isdir(path) else None
+
+#######################################################################################################################
+# Function that returns the process-wide OCR engine pool, creating it on first use
+# Parameters: none
+# Returns: the shared OcrEnginePool
+#######################################################################################################################
+def get_engine_pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = OcrEnginePool(tessdata_path=_default_tessdata_path())
+        return _POOL
+
+#######################################################################################################################
+# Functions that perform ocr on an image using a pooled engine
+# Parameters: the image to be scanned and a tesseract config string
+# Returns: the ocr data as a dictionary (image_to_data) or the plain text found (image_to_string)
+#######################################################################################################################
+def image_to_data(img, config=""):
+    with get_engine_pool().engine(config) as engine:
+        return engine.image_to_data(img)
+
+def image_to_string(img, config=""):
+    with get_engine_pool().engine(config) as engine:
+        return engine.image_to_string(img)
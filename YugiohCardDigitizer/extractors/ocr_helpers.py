@@ -7,7 +7,7 @@
 #                         high confidence words
 #######################################################################################################################
 
-import pytesseract
+from YugiohCardDigitizer.extractors import ocr_engine
 
 #######################################################################################################################
 # Function that performs ocr on an image and return the text extracted as a dictionary
@@ -20,8 +20,17 @@ def ocr_data(img, config=""):
     # append any optional configurations
     cfg = ("--oem 3 " + config).strip()
 
-    # perform ocr to get each word detected, output as a dictionary instead of plain text, pass in configurations
-    return pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT, config=cfg)
+    # perform ocr with a warm engine from the pool to get each word detected as a dictionary instead of plain text
+    return ocr_engine.image_to_data(img, config=cfg)
+
+#######################################################################################################################
+# Function that performs ocr on an image and returns the text extracted as a plain string
+# Parameters: the image to be scanned and optional configurations if desired
+# Returns: the text found in the image
+#######################################################################################################################
+def ocr_string(img, config=""):
+    """Return the plain text tesseract finds in an image."""
+    return ocr_engine.image_to_string(img, config=config)
 
 #######################################################################################################################
 # Function that takes data returned by ocr and only keeps words that pass a certain confidence level
@@ -54,3 +63,21 @@ def ocr_text_from_data(data, min_conf=60):
 
     # join the list together with a space separator
     return " ".join(words).strip()
+
+#######################################################################################################################
+# Function that works out how sure ocr was of the words it found
+# Parameters: the ocr data
+# Returns: the mean confidence (0-100) of every non-empty word, or 0 if no words were found
+#######################################################################################################################
+def mean_confidence(data):
+    """Averages the confidence of every word tesseract detected"""
+    confidences = []
+    for index, word in enumerate(data.get('text', [])):
+        if not word.strip():
+            continue
+        # same as above, a confidence that can't be read counts as no confidence at all
+        try:
+            confidences.append(max(0.0, float(data['conf'][index])))
+        except:
+            confidences.append(0.0)
+    return sum(confidences) / len(confidences) if confidences else 0.0
@@ -7,17 +7,28 @@
 #####################################################################################################################
 
 # imports
+import io                                                                               # for in-memory image files
 import os                                                                               # for file operations
 import sqlite3
 
-from werkzeug.utils import secure_filename                                              # to sanitizing filenames
 from flask import Flask, session, render_template, request, redirect, flash, url_for    # for webapp functionality
+from flask import Response, abort, jsonify, send_file, stream_with_context
 import webbrowser                                                                       # for launching the app
-import DBcm                                                                             # for database functionality
 
+from YugiohCardDigitizer.utils.assets import asset_path, send_static
 from YugiohCardDigitizer.utils.constants import KNOWN_ATTRIBUTES
 from YugiohCardDigitizer.utils.install_tesseract import ensure_tesseract
-from tesseract import process_yugioh_card                                             # for ocr image processing
+from YugiohCardDigitizer.utils.thumbnails import queue_thumbnails, thumbnail_static_path
+from YugiohCardDigitizer.utils.tracing import get_trace, recent_traces
+from YugiohCardDigitizer.data_layer.database import reading, writing                   # for database functionality
+from YugiohCardDigitizer.data_layer.card_filters import FACETS, RANGES, RESULT_LIMIT as FILTER_LIMIT, filter_cards
+from YugiohCardDigitizer.data_layer.card_transfer import EXPORTERS
+from YugiohCardDigitizer.data_layer.card_versions import card_etag, library_etag
+from YugiohCardDigitizer.data_layer.card_search import RESULT_LIMIT, search_cards
+from YugiohCardDigitizer.data_layer.library_pages import PAGE_SIZE, SORT_KEYS, get_library_card, get_library_page
+from YugiohCardDigitizer.data_layer.image_store import find_near_duplicate, release_image, store_image
+from YugiohCardDigitizer.data_layer.scan_jobs import DONE, FAILED, get_job, get_jobs
+from scan_queue import submit_scan                                                      # for background ocr scans
 
 # main program variables
 app = Flask(__name__)                               # defines main app object associated with code's current namespace
@@ -25,6 +36,18 @@ app.secret_key = "supercalifragilistic"             # defines a key for encrypti
 UPLOAD_FOLDER = "static/images/cards"               # defines the fil path to the folder for storing uploaded images
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}  # defines what images extensions are allowed to be uploaded
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER         # stores the upload folder path as a Flask configuration for use
+app.jinja_env.globals["thumbnail"] = thumbnail_static_path  # lets templates find a card image's thumbnails
+app.view_functions["static"] = send_static          # serves static files with long-lived caching (see utils/assets.py)
+
+#######################################################################################################################
+# Function: points every url_for("static", ...) at the fingerprinted copy of a stylesheet or script, so pages always
+#           link to the current version and browsers can cache it forever
+# Parameters: the endpoint and the values url_for was given
+#######################################################################################################################
+@app.url_defaults
+def fingerprint_static(endpoint, values):
+    if endpoint == "static" and "filename" in values:
+        values["filename"] = asset_path(values["filename"])
 
 #######################################################################################################################
 # Function: checks whether an uploaded filename has an allowed file extension
@@ -34,44 +57,6 @@ def allowed_file(filename):
     # check if filename has a . and if splitting the filename by . only once and casting to lower is in ALLOW_EXTENSIONS
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
-#######################################################################################################################
-# Function: retrieves all cards in the database and storing in session
-# Returns.: session data for all cards in the database
-#######################################################################################################################
-def retrieve_library():
-    db_details = "data_layer/Cards.sqlite3"
-
-    # If session has no cache or the card with the highest id isn't the same as the last fetch, refresh cache
-    if "cards" not in session:
-        with DBcm.UseDatabase(db_details) as db:
-            sql = """
-                SELECT id, name, card_type, monster_type, description, attack, defense, attribute, image_filename
-                FROM cards
-                ORDER BY name
-            """
-            db.execute(sql)
-            results = db.fetchall()
-
-        # Convert tuples to list of dictionaries for easier Jinja display
-        cards = []
-        for row in results:
-            cards.append({
-                "id": row[0],
-                "name": row[1],
-                "card_type": row[2],
-                "monster_type": row[3],
-                "description": row[4],
-                "attack": row[5],
-                "defense": row[6],
-                "attribute": row[7],
-                "image_filename": row[8],
-            })
-
-        # Save new cache + new database state
-        session["cards"] = cards
-
-    return session["cards"]
-
 #######################################################################################################################
 # Function: route that handles get requests for the home page
 # Returns.: index.html
@@ -84,18 +69,144 @@ def index():
         title="Yugioh Card Library") # the title used in the head element for the page
 
 #######################################################################################################################
-# Function: handles get requests to view all cards in the database
+# Function: handles get requests to view one page of the cards in the database
+# Parameters: optional "sort" and "order" query strings, the "after" or "before" cursor of the page to show, and the
+#             page size as "per_page"
 # Returns.: library.html
 #######################################################################################################################
 @app.get("/library")
 def library():
-    cards = retrieve_library()
+    # the library used to be copied into the session cookie. Drop any copy an older browser session still carries
+    session.pop("cards", None)
+
+    try:
+        page = get_library_page(
+            sort=request.args.get("sort", "name"),
+            order=request.args.get("order") or None,
+            after=request.args.get("after") or None,
+            before=request.args.get("before") or None,
+            per_page=request.args.get("per_page", PAGE_SIZE, type=int)
+        )
+    except ValueError:
+        abort(400)
+
     return render_template(
         "library.html",
         title="Your Library",
-        cards=cards # the session data for all cards in the database
+        cards=page["cards"],  # the cards on this page
+        page=page,            # the cursors and sort order of this page
+        sort_keys=SORT_KEYS
+    )
+
+#######################################################################################################################
+# Function   : handles get requests to download the whole library. The file is streamed as it's read from the
+#              database, so the library never has to fit in memory
+# Parameters : the format, "csv" or "jsonl"
+# Returns    : the library as a CSV or JSON Lines file
+#######################################################################################################################
+@app.get("/export/library.<fmt>")
+def export_library(fmt):
+    if fmt not in EXPORTERS:
+        abort(404)
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(
+        stream_with_context(EXPORTERS[fmt]()),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=library.{fmt}"}
     )
 
+#######################################################################################################################
+# Function   : handles get requests to search card names and descriptions. The page asks for JSON as you type
+# Parameters : the search text as "q", the most results as "limit", and "format=json" for JSON instead of a page
+# Returns    : search.html, or the results as JSON
+#######################################################################################################################
+@app.get("/search")
+def search():
+    query = request.args.get("q", "")
+    results = search_cards(query, limit=request.args.get("limit", RESULT_LIMIT, type=int))
+
+    if request.args.get("format") == "json" or request.accept_mimetypes.best == "application/json":
+        return jsonify({"query": query, "results": results})
+    return render_template("search.html", title="Search Cards", query=query, results=results)
+
+#######################################################################################################################
+# Function   : handles get requests to filter the library, returning the matching cards and how many cards have each
+#              type, attribute and monster type under the filter
+# Parameters : any number of "card_type", "attribute" and "monster_type" values, "atk_min", "atk_max", "def_min" and
+#              "def_max", the "after" or "before" cursor of the page next to it and the most results as "limit"
+# Returns    : the results as JSON, or a JSON error with status 400 for an invalid cursor
+#######################################################################################################################
+@app.get("/filter")
+def filter_library():
+    filters = {facet: request.args.getlist(facet) for facet in FACETS}
+    for column, prefix in zip(RANGES, ("atk", "def")):
+        filters[column] = (request.args.get(f"{prefix}_min", type=int), request.args.get(f"{prefix}_max", type=int))
+
+    try:
+        return jsonify(filter_cards(
+            filters,
+            after=request.args.get("after") or None,
+            before=request.args.get("before") or None,
+            limit=request.args.get("limit", FILTER_LIMIT, type=int)
+        ))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+#######################################################################################################################
+# Function   : answers a get request with JSON and its ETag. A client sending back the ETag of what it already has (as
+#              If-None-Match) gets an empty 304 instead, and the JSON is never even built. Cache-Control no-cache has
+#              clients and proxies check back every time rather than guessing how long the data stays fresh
+# Parameters : the ETag, and a function returning the data to send as JSON
+# Returns    : the response
+#######################################################################################################################
+def conditional_json(etag, build):
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+#######################################################################################################################
+# Function   : handles get requests for one page of the cards as JSON, for sync clients. The ETag is the version of
+#              the whole library, so polling an unchanged library transfers nothing
+# Parameters : the same query strings as the library page ("sort", "order", "after", "before" and "per_page")
+# Returns    : the page's "cards", "next_cursor", "prev_cursor", "sort", "order" and "per_page" as JSON
+#######################################################################################################################
+@app.get("/api/cards")
+def api_cards():
+    # the version is read before the cards, so a change in between can only make the ETag older than the cards, and
+    # the next poll loads them again, never newer, which would hide the change from the client
+    etag = library_etag()
+
+    def build():
+        return get_library_page(
+            sort=request.args.get("sort", "name"),
+            order=request.args.get("order") or None,
+            after=request.args.get("after") or None,
+            before=request.args.get("before") or None,
+            per_page=request.args.get("per_page", PAGE_SIZE, type=int)
+        )
+
+    try:
+        return conditional_json(etag, build)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+#######################################################################################################################
+# Function   : handles get requests for a single card as JSON. The ETag is a hash of the card, so it only changes when
+#              that card does
+# Parameters : the card's database id
+# Returns    : the card as JSON
+#######################################################################################################################
+@app.get("/api/cards/<int:card_id>")
+def api_card(card_id):
+    card = get_library_card(card_id)
+    if card is None:
+        return jsonify({"error": "Card not found"}), 404
+    return conditional_json(card_etag(card), lambda: card)
+
 #######################################################################################################################
 # Function   : handles get requests to view a single card's full information
 # Parameters : the card's database id
@@ -103,31 +214,13 @@ def library():
 #######################################################################################################################
 @app.get("/view/<int:card_id>")
 def view_card(card_id):
-    db_details = "data_layer/Cards.sqlite3"
-
-    # query the database to select the chosen card's id number
-    with DBcm.UseDatabase(db_details) as db:
-        query = "SELECT id, name, card_type, monster_type, description, attack, defense, attribute, image_filename FROM cards WHERE id = ?"
-        db.execute(query, (card_id,))
-        row = db.fetchone()
+    # look the card up by its id
+    card = get_library_card(card_id)
 
     # if the card isn't found, return an error
-    if not row:
+    if card is None:
         return "Card not found", 404
 
-    # Convert tuple to dictionary
-    card = {
-        "id": row[0],
-        "name": row[1],
-        "card_type": row[2],
-        "monster_type": row[3],
-        "description": row[4],
-        "attack": row[5],
-        "defense": row[6],
-        "attribute": row[7],
-        "image_filename": row[8] if len(row) > 8 else None
-    }
-
     return render_template("view_card.html", title="View Card", card=card)
 
 #######################################################################################################################
@@ -137,14 +230,10 @@ def view_card(card_id):
 #######################################################################################################################
 @app.route("/edit/<int:card_id>", methods=["GET", "POST"])
 def edit_card(card_id):
-    db_details = "data_layer/Cards.sqlite3"
-
     # GET load the form with card data
     if request.method == "GET":
-        cards = retrieve_library()
-        # looks through every card retrieved and returns the matching id
-        # stop the loop once found using the next() function
-        card = next((c for c in cards if c["id"] == card_id), None)
+        # look the card up by its id
+        card = get_library_card(card_id)
 
         # if card isn't found, return a 404 error
         if card is None:
@@ -160,7 +249,7 @@ def edit_card(card_id):
 
     # POST and save the updated card
     form = request.form
-    with DBcm.UseDatabase(db_details) as db:
+    with writing() as db:
         sql = """
             UPDATE cards
             SET name=?, card_type=?, monster_type=?, description=?, attack=?, defense=?, attribute=?
@@ -177,9 +266,6 @@ def edit_card(card_id):
             card_id
         ))
 
-    # Clear the cached library so it refreshes
-    session.pop("cards", None)
-
     flash("Card successfully updated!", "success")
 
     return redirect(url_for("library"))
@@ -190,8 +276,6 @@ def edit_card(card_id):
 #######################################################################################################################
 @app.route("/add", methods=["GET", "POST"])
 def add_card():
-    db_details = "data_layer/Cards.sqlite3"
-
     # if a post is made, parse the form's data into variables
     if request.method == "POST":
         name = request.form["name"]
@@ -225,15 +309,23 @@ def add_card():
                 card=card
             )
 
-        # if the file exists and is an allowed extension, sanitize the filename and save to the upload folder
+        # if the file exists and is an allowed extension, save it to the upload folder under its content hash
+        filename = None
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            file.save(os.path.join(app.config["UPLOAD_FOLDER"], filename))
-        else:
-            filename = None
+            try:
+                filename = store_image(file)
+            except ValueError:
+                flash("That file isn't a readable image.", "danger")
+                return render_template(
+                    "add_edit.html",
+                    title="Add Card",
+                    KNOWN_ATTRIBUTES=KNOWN_ATTRIBUTES,
+                    card=card
+                )
+            queue_thumbnails(filename) # made in the background so the upload isn't slowed down
 
         # Save all data to the database
-        with DBcm.UseDatabase(db_details) as db:
+        with writing() as db:
             # placeholder query
             sql = """
             INSERT INTO cards (name, card_type, monster_type, description, attack, defense, attribute, image_filename)
@@ -250,9 +342,6 @@ def add_card():
                 filename
             ))
 
-        #Clear session cache so the app is forced to refresh it next time. Prevent errors in no cache by that key exists
-        session.pop("cards", None)
-
         # send a confirmation flash message back the return page and redirect back to home page
         flash("Card successfully added!", "success")
         return redirect(url_for("index"))
@@ -272,10 +361,8 @@ def add_card():
 #######################################################################################################################
 @app.get("/delete/<int:card_id>")
 def confirm_delete(card_id):
-    db_details = "data_layer/Cards.sqlite3"
-
     # retrieve the card to be deleted from the database to display to the user for confirmation
-    with DBcm.UseDatabase(db_details) as db:
+    with reading() as db:
         sql = "SELECT id, name, image_filename FROM cards WHERE id = ?"
         db.execute(sql, (card_id,))
         card = db.fetchone()
@@ -300,10 +387,8 @@ def confirm_delete(card_id):
 #######################################################################################################################
 @app.post("/delete/<int:card_id>")
 def delete_card(card_id):
-    db_details = "data_layer/Cards.sqlite3"
-
     # perform the database operation for selecting the chosen card from the database and actually deleting it
-    with DBcm.UseDatabase(db_details) as db:
+    with writing() as db:
         sql = "SELECT image_filename FROM cards WHERE id = ?"
         db.execute(sql, (card_id,))
         row = db.fetchone()
@@ -311,14 +396,9 @@ def delete_card(card_id):
         sql = "DELETE FROM cards WHERE id = ?"
         db.execute(sql, (card_id,))
 
-    # Clear cached session list
-    session.pop("cards", None)
-
-    # Delete image file if present
+    # Delete the image file and its thumbnails, unless another card uses the same image
     if row and row[0]:
-        filepath = os.path.join("static", "images", "cards", row[0])
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        release_image(row[0])
 
     flash("Card successfully deleted", "danger")
     return redirect(url_for("library"))
@@ -337,35 +417,100 @@ def scan():
 
         return render_template("scan.html", title="Scan Image", tesseract_exists=tesseract_exists)
 
-    # POST → handle uploaded image
-    file = request.files.get("card_image")
+    # POST → handle the uploaded images. Several cards can be uploaded at once
+    files = [file for file in request.files.getlist("card_image") if file and file.filename]
 
-    if not file or file.filename == "":
+    if not files:
         flash("No file selected", "danger")
         return redirect(url_for("scan"))
 
-    if not allowed_file(file.filename):
-        # Save the uploaded file
+    if not all(allowed_file(file.filename) for file in files):
         flash("Unsupported file type. Please use one of the following extensions: png, jpg, jpeg, gif", "danger")
         return redirect(url_for("scan"))
 
-    # Save the uploaded file
-    filename = secure_filename(file.filename)
-    filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-    file.save(filepath)
+    # Save each uploaded file and queue it for OCR. The scans run in the background so this returns right away
+    job_ids = []
+    duplicates = []
+    for file in files:
+        try:
+            filename = store_image(file)
+        except ValueError:
+            flash(f"{file.filename} isn't a readable image.", "danger")
+            continue
+        queue_thumbnails(filename)
+
+        # a photo of a card the library already has isn't worth scanning again
+        duplicate = find_near_duplicate(filename)
+        if duplicate and duplicate["card_id"] is not None:
+            flash(f"{file.filename} looks like {duplicate['card_name']}, which is already in your library.", "warning")
+            duplicates.append(duplicate)
+            continue
+        job_ids.append(submit_scan(os.path.join(app.config["UPLOAD_FOLDER"], filename)))
+
+    # when nothing was left to scan, show the card that was already there (or go back to try again)
+    if not job_ids:
+        if len(duplicates) == 1:
+            return redirect(url_for("view_card", card_id=duplicates[0]["card_id"]))
+        return redirect(url_for("scan") if not duplicates else url_for("library"))
+
+    # a single card goes straight to its own status page, which turns into the confirm form once it's scanned
+    if len(job_ids) == 1:
+        return redirect(url_for("scan_job", job_id=job_ids[0]))
+    return redirect(url_for("scan_jobs", ids=",".join(job_ids)))
 
-    # Run OCR on the uploaded image
-    try:
-        card_data = process_yugioh_card(filepath)
-    except Exception as e:
+#######################################################################################################################
+# Function   : handles get requests for the status of several scans submitted together
+# Parameters : the job ids as a comma separated "ids" query string
+# Returns    : scan_status.html
+#######################################################################################################################
+@app.get("/scan/jobs")
+def scan_jobs():
+    jobs = get_jobs(job_id for job_id in request.args.get("ids", "").split(",") if job_id)
+    if not jobs:
+        return "Scan not found", 404
+    return render_template("scan_status.html", title="Scanning Cards", jobs=jobs)
+
+#######################################################################################################################
+# Function   : handles get requests for a single scan. While it's queued or running the status page is shown, and
+#              once it's done the scanned card is shown in the confirm form
+# Parameters : the scan job's id
+# Returns    : scan_status.html or confirm_scan.html
+#######################################################################################################################
+@app.get("/scan/jobs/<job_id>")
+def scan_job(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return "Scan not found", 404
+
+    if job["status"] == FAILED:
         flash("Error processing image. Check logs.", "danger")
-        print("OCR ERROR:", e)
         return redirect(url_for("scan"))
 
-    # Include the saved image file for preview
-    card_data["image_filename"] = filename
+    if job["status"] == DONE:
+        # Include the saved image file for preview
+        card_data = job["result"]
+        card_data["image_filename"] = job["image_filename"]
+        return render_template("confirm_scan.html", title="Confirm Scan", card=card_data)
 
-    return render_template("confirm_scan.html",title="Confirm Scan", card=card_data)
+    return render_template("scan_status.html", title="Scanning Card", jobs=[job])
+
+#######################################################################################################################
+# Function   : handles get requests polling a scan's status
+# Parameters : the scan job's id
+# Returns    : the job's status as JSON
+#######################################################################################################################
+@app.get("/scan/jobs/<job_id>/status")
+def scan_job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Scan not found"}), 404
+    return jsonify({
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "image_filename": job["image_filename"],
+        "error": job["error"],
+        "url": url_for("scan_job", job_id=job["job_id"]),
+    })
 
 @app.post("/confirm_scan")
 def confirm_scan():
@@ -383,11 +528,13 @@ def confirm_scan():
     existing_filename = request.form.get("image_filename")
 
     # If user uploaded a new image, save it. Otherwise, keep the original filename
+    filename = existing_filename
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        file.save(os.path.join(app.config["UPLOAD_FOLDER"], filename))
-    else:
-        filename = existing_filename
+        try:
+            filename = store_image(file)
+            queue_thumbnails(filename)
+        except ValueError:
+            flash("The new image isn't a readable image, so the scanned one was kept.", "warning")
 
     # define a dictionary from all data obtained for the card
     card = {
@@ -402,8 +549,7 @@ def confirm_scan():
     }
 
     # Save data to database
-    db_details = "data_layer/Cards.sqlite3"
-    with DBcm.UseDatabase(db_details) as db:
+    with writing() as db:
         sql = """
             INSERT INTO cards (name, card_type, monster_type, description, attack, defense, attribute, image_filename)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
@@ -440,11 +586,42 @@ def confirm_scan():
             flash(f"An unexpected database error occurred: {e}", "danger")
             return render_template("confirm_scan.html", card=card)
 
-    session.pop("cards", None)
-
     flash("Card successfully added!", "success")
     return redirect(url_for("index"))
 
+#######################################################################################################################
+# Function   : handles get requests for the debug page listing the stage timings and images of the most recent scans
+#              only available while the app runs in debug mode
+# Returns    : debug_scans.html
+#######################################################################################################################
+@app.get("/debug/scans")
+def debug_scans():
+    if not app.debug:
+        abort(404)
+    return render_template("debug_scans.html", title="Recent Scans", traces=recent_traces())
+
+#######################################################################################################################
+# Function   : serves one intermediate image kept in memory by a recent scan's trace
+# Parameters : the trace's id and the name of the image
+# Returns    : the image as a png
+#######################################################################################################################
+@app.get("/debug/scans/<trace_id>/<image_name>.png")
+def debug_scan_image(trace_id, image_name):
+    if not app.debug:
+        abort(404)
+
+    # the trace may have fallen out of the ring buffer since the page was rendered
+    trace = get_trace(trace_id)
+    image = trace.image(image_name) if trace is not None else None
+    if image is None:
+        abort(404)
+
+    # encode the image in memory. Nothing touches the disk
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    buffer.seek(0)
+    return send_file(buffer, mimetype="image/png")
+
 # if the program is run directly, open the app in a web browser and run the app
 if __name__ == "__main__":
     # run Flask's built-in web server and pass the web app code to it
@@ -0,0 +1,155 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines a detection stage that finds every card in a photo (e.g. a 9-pocket binder page),
+#                         straightens each one with a perspective transform, and returns them as separate card images
+#######################################################################################################################
+# Based on the OpenCV contour pipeline sketched in Week_1/Lab2-1/detector.py
+
+import numpy as np
+from PIL import Image
+
+from YugiohCardDigitizer.preprocessing.normalize import CANONICAL_SIZE, open_image
+
+# OpenCV is only needed for multi-card photos. Without it every photo is treated as a single, framed card
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# the size every detected card is normalized to, the same canonical size single card photos are scanned at
+CARD_SIZE = CANONICAL_SIZE
+
+# page photos are decoded big enough for 3 cards side by side to each still be cut out at CARD_SIZE (a 9-pocket
+# page). Anything bigger than that is reduced while the JPEG is decoded
+PAGE_MIN_SIZE = (3 * CARD_SIZE[0], 3 * CARD_SIZE[0])
+
+# the range of height / width ratios accepted as a card. A perfect card is 86 / 59 = 1.46
+CARD_RATIO_RANGE = (1.30, 1.65)
+
+# a contour must cover at least this fraction of the photo to be considered a card (a 9-pocket page is ~1/9 each)
+MIN_CARD_AREA = 1 / 60
+
+# photos are shrunk to this width for finding contours. The card itself is cut out of the full-size photo
+DETECTION_WIDTH = 800
+
+#######################################################################################################################
+# Function that orders 4 corner points as top-left, top-right, bottom-right, bottom-left
+# Parameters: a (4, 2) array of points in any order
+# Returns: a (4, 2) float32 array of the ordered points
+#######################################################################################################################
+def order_points(pts):
+    pts = np.asarray(pts, dtype=np.float32)
+    ordered = np.zeros((4, 2), dtype=np.float32)
+    sums = pts.sum(axis=1)
+    diffs = np.diff(pts, axis=1).ravel()
+    ordered[0] = pts[np.argmin(sums)]   # top-left has the smallest x + y
+    ordered[2] = pts[np.argmax(sums)]   # bottom-right has the largest x + y
+    ordered[1] = pts[np.argmin(diffs)]  # top-right has the smallest y - x
+    ordered[3] = pts[np.argmax(diffs)]  # bottom-left has the largest y - x
+    return ordered
+
+#######################################################################################################################
+# Function that cuts a quadrilateral out of an image and warps it flat into a portrait card of CARD_SIZE
+# Parameters: the image as a numpy array and the 4 corner points of the card
+# Returns: the straightened card as a numpy array
+#######################################################################################################################
+def four_point_transform(image, pts):
+    rect = order_points(pts)
+    tl, tr, br, bl = rect
+    width = max(np.linalg.norm(br - bl), np.linalg.norm(tr - tl))
+    height = max(np.linalg.norm(tr - br), np.linalg.norm(tl - bl))
+
+    # a card lying on its side is rotated a quarter turn so every output is portrait
+    if width > height:
+        rect = np.roll(rect, -1, axis=0)
+
+    w, h = CARD_SIZE
+    target = np.array([[0, 0], [w - 1, 0], [w - 1, h - 1], [0, h - 1]], dtype=np.float32)
+    matrix = cv2.getPerspectiveTransform(rect, target)
+    return cv2.warpPerspective(image, matrix, (w, h), flags=cv2.INTER_AREA)
+
+#######################################################################################################################
+# Function that finds the 4-point contours in a photo that have the shape of a card
+# Parameters: the photo as an RGB numpy array
+# Returns: a list of (4, 2) corner arrays in full-size photo coordinates, in reading order
+#######################################################################################################################
+def find_card_quads(image):
+    # shrink the photo for contour finding. grayscale -> blurring -> canny edges -> dilation to close gaps
+    scale = image.shape[1] / DETECTION_WIDTH
+    small = cv2.resize(image, (DETECTION_WIDTH, max(1, int(image.shape[0] / scale))), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+    blur = cv2.GaussianBlur(gray, (9, 9), 0)
+    edges = cv2.Canny(blur, 30, 90)
+    dilated = cv2.dilate(edges, np.ones((11, 11), dtype=np.uint8))
+    contours, _ = cv2.findContours(dilated, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+    min_area = MIN_CARD_AREA * small.shape[0] * small.shape[1]
+    candidates = []
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if area < min_area:
+            continue
+
+        # 4-point contours most often resemble a rectangle / card shape
+        peri = cv2.arcLength(contour, True)
+        approx = cv2.approxPolyDP(contour, 0.05 * peri, True)
+        rect = cv2.minAreaRect(contour)
+        (_, _), (w, h), _ = rect
+        if len(approx) == 4 and cv2.isContourConvex(approx):
+            quad = approx.reshape(4, 2).astype(np.float32)
+        # a glare spot or a sleeve edge can add a corner or two to an outline that's still clearly a rectangle,
+        # so fall back to the tightest rotated rectangle when the contour fills nearly all of it
+        elif area >= 0.85 * w * h:
+            quad = cv2.boxPoints(rect).astype(np.float32)
+        else:
+            continue
+
+        # keep only quads with the proportions of a card, in either orientation
+        ratio = max(w, h) / max(1.0, min(w, h))
+        if CARD_RATIO_RANGE[0] <= ratio <= CARD_RATIO_RANGE[1]:
+            candidates.append((area, quad))
+
+    # the outline of a card and the outline of its art box or pocket can both match, so keep the largest quad and
+    # drop any other quad whose center falls inside one already kept
+    kept = []
+    for area, quad in sorted(candidates, key=lambda c: c[0], reverse=True):
+        center = tuple(float(v) for v in quad.mean(axis=0))
+        if not any(cv2.pointPolygonTest(other, center, False) >= 0 for other in kept):
+            kept.append(quad)
+
+    # sort into reading order: group into rows by center height, then left to right within a row
+    kept.sort(key=lambda q: q[:, 1].mean())
+    rows = []
+    for quad in kept:
+        card_height = np.ptp(quad[:, 1])
+        if rows and abs(quad[:, 1].mean() - rows[-1][0][:, 1].mean()) < card_height / 2:
+            rows[-1].append(quad)
+        else:
+            rows.append([quad])
+    ordered = [quad for row in rows for quad in sorted(row, key=lambda q: q[:, 0].mean())]
+
+    # scale the corners back up to the full-size photo
+    return [quad * scale for quad in ordered]
+
+#######################################################################################################################
+# Function that splits a photo of one or more cards into separate, straightened card images
+# Parameters: a filepath or an already opened PIL image, and whether a photo with no card outline found should be
+#             treated as a single framed card (a binder page never should)
+# Returns: a list of PIL card images in reading order. If no card outline is found (or OpenCV isn't installed) the
+#          photo is returned on its own, or with whole_photo_fallback off, the list is empty (or ImportError is raised)
+#######################################################################################################################
+def detect_cards(source, whole_photo_fallback=True):
+    if cv2 is None and not whole_photo_fallback:
+        raise ImportError("OpenCV is needed to find cards in a photo (pip install opencv-python)")
+    img = open_image(source, mode="RGB", min_size=PAGE_MIN_SIZE)
+    if cv2 is None:
+        return [img]
+
+    image = np.asarray(img)
+    quads = find_card_quads(image)
+    if not quads:
+        return [img] if whole_photo_fallback else []
+    return [Image.fromarray(four_point_transform(image, quad)) for quad in quads]
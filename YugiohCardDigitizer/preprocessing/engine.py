@@ -0,0 +1,144 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines a preprocessing engine that decodes and grayscales a card once, runs every region's
+#                         filter chain on numpy views of that single buffer, and saves the expensive upscale for last
+#######################################################################################################################
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from YugiohCardDigitizer.preprocessing.cropping import region_boxes
+from YugiohCardDigitizer.preprocessing.normalize import normalize_card
+
+#######################################################################################################################
+# Function that decodes a card image and converts it to grayscale exactly once, at the canonical card size
+# Parameters: a filepath or an already opened PIL image
+# Returns: the whole card as a 2-D uint8 numpy array of CANONICAL_SIZE
+#######################################################################################################################
+def decode_gray(source):
+    return np.asarray(normalize_card(source, mode="L"))
+
+#######################################################################################################################
+# Function that slices each region out of the grayscale card. Slicing a numpy array makes a view, not a copy
+# Parameters: the grayscale card array
+# Returns: a dictionary of region name -> array view
+#######################################################################################################################
+def region_views(gray):
+    h, w = gray.shape
+    views = {}
+    for key, box in region_boxes(w, h).items():
+        # Pillow rounds fractional box edges when cropping, so do the same to land on identical pixels
+        left, upper, right, lower = (int(round(v)) for v in box)
+        views[key] = gray[upper:lower, left:right]
+    return views
+
+#######################################################################################################################
+# Function that stretches an array's brightness range to 0-255 just like ImageOps.autocontrast
+# Parameters: a 2-D uint8 array and the percent of darkest/lightest pixels to ignore
+# Returns: a new contrast-stretched uint8 array
+#######################################################################################################################
+def autocontrast(arr, cutoff=0):
+    hist = np.bincount(arr.ravel(), minlength=256)
+    if cutoff:
+        # ignore the darkest and lightest cutoff% of pixels, the same way Pillow trims the histogram
+        cut = arr.size * cutoff // 100
+        cumulative = np.cumsum(hist)
+        lo = int(np.searchsorted(cumulative, cut, side="right"))
+        hi = int(255 - np.searchsorted(np.cumsum(hist[::-1]), cut, side="right"))
+    else:
+        nonzero = np.flatnonzero(hist)
+        lo, hi = (int(nonzero[0]), int(nonzero[-1])) if nonzero.size else (0, 0)
+    if hi <= lo:
+        return arr.copy()
+
+    # build a lookup table once and map every pixel through it
+    scale = 255.0 / (hi - lo)
+    lut = np.clip((np.arange(256) * scale - lo * scale).astype(np.int32), 0, 255).astype(np.uint8)
+    return lut[arr]
+
+#######################################################################################################################
+# Function that replaces each pixel with the median of its 3x3 neighborhood like ImageFilter.MedianFilter(3)
+# Parameters: a 2-D uint8 array
+# Returns: a new filtered uint8 array
+#######################################################################################################################
+def median3(arr):
+    padded = np.pad(arr, 1, mode="edge")
+    h, w = arr.shape
+    # stack the 9 shifted views of the neighborhood and take the middle value of each pixel's stack
+    stack = np.stack([padded[y:y + h, x:x + w] for y in range(3) for x in range(3)])
+    return np.partition(stack, 4, axis=0)[4]
+
+#######################################################################################################################
+# Function that blends an array away from (or towards) its mean brightness like ImageEnhance.Contrast
+# Parameters: a 2-D uint8 array and the enhancement factor
+# Returns: a new uint8 array
+#######################################################################################################################
+def contrast(arr, factor):
+    mean = int(arr.mean() + 0.5)
+    return np.clip(mean + factor * (arr.astype(np.float32) - mean), 0, 255).astype(np.uint8)
+
+#######################################################################################################################
+# Function that sharpens the edges in an array with Pillow's unsharp mask
+# Parameters: a 2-D uint8 array and the unsharp mask radius and percent
+# Returns: a new uint8 array
+#######################################################################################################################
+def unsharp(arr, radius, percent):
+    img = Image.fromarray(np.ascontiguousarray(arr))
+    return np.asarray(img.filter(ImageFilter.UnsharpMask(radius=radius, percent=percent)))
+
+#######################################################################################################################
+# Function that enlarges an array with the LANCZOS filter. This is the most expensive step so it always runs last
+# Parameters: a 2-D uint8 array and the scale factor
+# Returns: the enlarged region as a PIL image ready for OCR
+#######################################################################################################################
+def upscale(arr, factor):
+    img = Image.fromarray(np.ascontiguousarray(arr))
+    if factor == 1:
+        return img
+    return img.resize((img.width * factor, img.height * factor), Image.LANCZOS)
+
+# how much each region is enlarged for OCR. These match the scale factors of the old Pillow chains
+UPSCALE = {"name": 3, "type": 6, "description": 2, "atkdef": 3}
+
+# the cheaper scale factors tried first by adaptive OCR. A region is only enlarged by UPSCALE if OCR isn't confident
+# in what it read at this size
+FAST_UPSCALE = {"name": 2, "type": 3, "description": 1, "atkdef": 2}
+
+#######################################################################################################################
+# Functions holding each region's filter chain. They mirror the Pillow chains the app used to run on each cropped
+# region (kept in tests/test_preprocessing.py to compare against), but every filter runs at the region's original
+# size and the upscale happens at the very end. To keep the output close to the old chains:
+#   - an unsharp mask that used to run after an N-times upscale runs before it with its radius divided by N
+#   - a 3x3 median that used to run after an upscale is dropped, since on an enlarged image it barely changes a pixel
+#     (running it before the upscale instead would smear text N times more than it used to)
+# Parameters: the region's grayscale array view and the scale factor to enlarge it by
+# Returns: the preprocessed region as a PIL image
+#######################################################################################################################
+def prepare_name(view, scale=UPSCALE["name"]):
+    arr = autocontrast(view)                            # increase the contrast for better recognition
+    arr = median3(arr)                                  # remove noise
+    arr = unsharp(arr, radius=1, percent=150)           # sharpen the edges of card text etc.
+    return upscale(arr, scale)
+
+def prepare_type(view, scale=UPSCALE["type"]):
+    arr = autocontrast(view)                            # perform auto-contrast enhancement
+    arr = unsharp(arr, radius=1 / scale, percent=250)   # sharpen edges of text etc.
+    arr = contrast(arr, 1.5)                            # increase contrast some more
+    return upscale(arr, scale)
+
+def prepare_description(view, scale=UPSCALE["description"]):
+    # the old chain's only filter was a 3x3 median after the upscale. Dropped like the others, this region has no
+    # filter left, which changes its pixels the most of any region (a mean of about 1.4 out of 255 on samples/)
+    return upscale(view, scale)
+
+def prepare_atkdef(view, scale=UPSCALE["atkdef"]):
+    arr = autocontrast(view)                            # stretch brightness levels for OCR
+    arr = unsharp(arr, radius=1 / scale, percent=150)   # make edges crisper
+    return upscale(arr, scale)
+
+def prepare_attribute(view):
+    # the attribute icon isn't OCR'd. classify_attribute resizes and filters it itself, so only the contrast is needed
+    return Image.fromarray(autocontrast(view, cutoff=4))
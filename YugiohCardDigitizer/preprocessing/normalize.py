@@ -0,0 +1,82 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines the first stage of the pipeline, which decodes a card photo at no more than the
+#                         resolution OCR needs and resizes it to one canonical size, whatever size or shape the upload
+#                         was
+#######################################################################################################################
+
+from PIL import Image, ImageOps
+
+# the size every card is scanned at (width, height). Real cards are 59mm x 86mm, so this is 10 pixels per mm. The
+# crop boxes in cropping.py and the upscale factors in engine.py are all tuned for a card of this size
+CANONICAL_SIZE = (590, 860)
+
+# how far (as a fraction) a photo's width to height ratio may be from a card's and still be resized straight to the
+# canonical size. A photo further off than that would be visibly stretched, so it's cropped to a card's shape first
+ASPECT_TOLERANCE = 0.03
+
+# the EXIF orientation tag, and the orientations that turn a photo on its side (width and height swap)
+_ORIENTATION_TAG = 0x0112
+_SIDEWAYS_ORIENTATIONS = {5, 6, 7, 8}
+
+#######################################################################################################################
+# Function that opens an image the cheap way. A JPEG (like every phone photo) is asked to decode in draft mode, where
+# libjpeg scales it down by 2, 4 or 8 while decoding, so a 12 MP photo never gets decoded at full size. The photo is
+# then turned upright according to its EXIF orientation
+# Parameters: a filepath or an already opened PIL image, the mode to convert to ("L" for grayscale or "RGB"), and
+#             the smallest (width, height) the decoded image must still have (None decodes at full size)
+# Returns: the upright PIL image in the requested mode
+#######################################################################################################################
+def open_image(source, mode="RGB", min_size=None):
+    img = Image.open(source) if isinstance(source, str) else source
+    orientation = img.getexif().get(_ORIENTATION_TAG, 1)
+
+    # draft() only does anything for a JPEG that hasn't been decoded yet. It picks the biggest reduction that still
+    # leaves the image at least min_size, and can decode straight to grayscale. The size is asked for before the photo
+    # is turned upright, so a sideways photo asks for its width and height the other way around
+    if min_size is not None:
+        width, height = min_size
+        if orientation in _SIDEWAYS_ORIENTATIONS:
+            width, height = height, width
+        img.draft(mode, (width, height))
+
+    if orientation != 1:
+        img = ImageOps.exif_transpose(img)
+    return img if img.mode == mode else img.convert(mode)
+
+#######################################################################################################################
+# Function that works out the part of an image to resize to a size without stretching it. An image close enough to
+# the size's shape is used whole. Otherwise the extra width or height is cut evenly off both sides, which keeps a card
+# photographed with some background around it in the middle
+# Parameters: the image's (width, height) and the size it's being resized to
+# Returns: the (left, top, right, bottom) box to resize
+#######################################################################################################################
+def card_crop_box(image_size, size=CANONICAL_SIZE):
+    width, height = image_size
+    target_ratio = size[0] / size[1]
+    ratio = width / height
+    if abs(ratio - target_ratio) <= target_ratio * ASPECT_TOLERANCE:
+        return (0, 0, width, height)
+    if ratio > target_ratio:
+        crop_width = height * target_ratio
+        left = (width - crop_width) / 2
+        return (left, 0, left + crop_width, height)
+    crop_height = width / target_ratio
+    top = (height - crop_height) / 2
+    return (0, top, width, top + crop_height)
+
+#######################################################################################################################
+# Function that normalizes a card image to the canonical resolution. Decode time and memory stay about the same no
+# matter how big the upload is, and every later stage works on an image of a known size with a card's proportions
+# Parameters: a filepath or an already opened PIL image, the mode to convert to, and the size to normalize to
+# Returns: the card as a PIL image of exactly that size
+#######################################################################################################################
+def normalize_card(source, mode="L", size=CANONICAL_SIZE):
+    img = open_image(source, mode, min_size=size)
+    if img.size != size:
+        # the crop is done by the resize itself, so no cropped copy of the full-size image is made
+        img = img.resize(size, Image.LANCZOS, box=card_crop_box(img.size, size))
+    return img
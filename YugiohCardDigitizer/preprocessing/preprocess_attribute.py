@@ -21,19 +21,4 @@ def preprocess_attr_for_match(img):
     gray = ImageEnhance.Brightness(gray).enhance(0.9) # increase brightness
     gray = gray.filter(ImageFilter.EDGE_ENHANCE_MORE) # sharpens the edges of elements like text
     gray = ImageOps.autocontrast(gray) # perform auto-contrast to stretch image and remove washed out values in graph
-    return gray
-
-#######################################################################################################################
-# Function used to prepare a card's cropped attribute icon for OCR
-# Parameters: the original cropped image of the card's attribute icon
-# Returns: a processed version of the image supplied
-#######################################################################################################################
-def preprocess_attribute(img):
-    """
-    Prepares the cropped image of a card's attribute icon for OCR
-    """
-    img = img.resize((img.width * 2, img.height * 2), Image.LANCZOS) # increase image size
-    img = img.filter(ImageFilter.MedianFilter(size=3))# remove noise by replacing each pixel with the median of neighbor
-    img = ImageOps.autocontrast(img, cutoff=4) # Increase all pixel's contrast except the more extreme black/whites
-
-    return img
\ No newline at end of file
+    return gray
\ No newline at end of file
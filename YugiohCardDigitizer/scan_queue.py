@@ -0,0 +1,71 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines the background queue the web app submits scans to, so an upload returns right away
+#                         instead of holding the request open while OCR runs
+#######################################################################################################################
+
+# imports
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor  # for running scans in the background
+
+from tesseract import process_yugioh_card_cached   # for ocr image processing
+from YugiohCardDigitizer.data_layer.scan_jobs import create_job, mark_done, mark_failed, mark_running
+
+# how many cards are scanned at the same time. Each scan already runs its regions on several threads, so a couple of
+# scans at once is enough to keep tesseract busy. Anything beyond that waits in the queue
+SCAN_WORKERS = 2
+_scan_executor = None
+_scan_executor_lock = threading.Lock()
+
+#######################################################################################################################
+# Function that returns the background scan executor, creating it the first time a scan is submitted
+# Parameters: none
+# Returns: the ThreadPoolExecutor scans run on
+#######################################################################################################################
+def _get_scan_executor():
+    global _scan_executor
+    with _scan_executor_lock:
+        if _scan_executor is None:
+            _scan_executor = ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix="scan-job")
+        return _scan_executor
+
+#######################################################################################################################
+# Function that forgets the parent's executor in a forked child process, since the parent's threads don't exist in
+# the child. The child creates a fresh executor on its first scan
+#######################################################################################################################
+def _reset_scan_executor():
+    global _scan_executor
+    _scan_executor = None
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_scan_executor)
+
+#######################################################################################################################
+# Function that runs one queued scan on a worker thread and records how it went
+# Parameters: the job's id and the filepath of the uploaded image
+# Returns: void
+#######################################################################################################################
+def _run_scan_job(job_id, filepath):
+    mark_running(job_id)
+    try:
+        # re-uploads of the same photo are answered from the scan cache
+        card = process_yugioh_card_cached(filepath)
+    except Exception as e:
+        print("OCR ERROR:", e)
+        mark_failed(job_id, f"{type(e).__name__}: {e}")
+        return
+    mark_done(job_id, card)
+
+#######################################################################################################################
+# Function that queues an uploaded image to be scanned in the background
+# Parameters: the filepath the upload was saved to
+# Returns: the id of the scan job, used to poll for its status
+#######################################################################################################################
+def submit_scan(filepath):
+    job_id = create_job(os.path.basename(filepath))
+    _get_scan_executor().submit(_run_scan_job, job_id, filepath)
+    return job_id
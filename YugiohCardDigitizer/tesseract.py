@@ -7,72 +7,262 @@
 #######################################################################################################################
 
 # imports from python library
-from PIL import Image, ImageOps, ImageFilter, ImageEnhance  # for image manipulation
-import pytesseract                              # for ocular recognition functionality
 import re                                       # for pattern matching text extracted from cards
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor  # for running the independent regions of a card at the same time
+from functools import partial                      # for binding each stage's inputs
 
 # imports from various other modules of the program
+from YugiohCardDigitizer.data_layer.scan_cache import file_digest, get_cached_scan, store_scan
 from YugiohCardDigitizer.extractors.atkdef_extractor import fix_atkdef_labels, extract_atk_def_numbers
 from YugiohCardDigitizer.extractors.attribute_classifier import classify_attribute
-from YugiohCardDigitizer.extractors.name_extractor import correct_chars_for_name
-from YugiohCardDigitizer.extractors.ocr_helpers import ocr_data, ocr_text_from_data
+from YugiohCardDigitizer.extractors.description_corrector import correct_description
+from YugiohCardDigitizer.extractors.name_extractor import match_catalog_name
+from YugiohCardDigitizer.extractors.ocr_helpers import mean_confidence, ocr_data, ocr_string, ocr_text_from_data
 from YugiohCardDigitizer.extractors.type_extractor import match_monster_type
-from YugiohCardDigitizer.preprocessing.cropping import crop_regions
-from YugiohCardDigitizer.preprocessing.preprocess_atkdef import preprocess_atkdef
-from YugiohCardDigitizer.preprocessing.preprocess_attribute import preprocess_attribute
-from YugiohCardDigitizer.preprocessing.preprocess_description import preprocess_desc
-from YugiohCardDigitizer.preprocessing.preprocess_name import preprocess_name
-from YugiohCardDigitizer.preprocessing.preprocess_type import preprocess_type
-from YugiohCardDigitizer.utils.debug import debug_show_crops
+from YugiohCardDigitizer.preprocessing.engine import (FAST_UPSCALE, decode_gray, region_views, prepare_atkdef,
+                                                      prepare_attribute, prepare_description, prepare_name,
+                                                      prepare_type)
+from YugiohCardDigitizer.utils.stage_graph import StageGraph
+from YugiohCardDigitizer.utils.tracing import finish_trace, start_trace
 
+# a bounded pool of threads shared by every scan for running a card's regions concurrently. tesseract runs outside of
+# python and releases the GIL, so the regions genuinely overlap instead of taking turns
+REGION_WORKERS = 5 # one thread per region of a card
+_region_executor = None
+_region_executor_lock = threading.Lock()
+
+#######################################################################################################################
+# Function that returns the shared region executor, creating it the first time a card is scanned in this process
+# Parameters: none
+# Returns: the ThreadPoolExecutor used for region stages
+#######################################################################################################################
+def _get_region_executor():
+    global _region_executor
+    with _region_executor_lock:
+        if _region_executor is None:
+            _region_executor = ThreadPoolExecutor(max_workers=REGION_WORKERS, thread_name_prefix="ocr-region")
+        return _region_executor
+
+#######################################################################################################################
+# Function that forgets the parent's executor in a forked child process (e.g. batch_scan workers), since the
+# parent's threads don't exist in the child. The child creates a fresh executor on its first scan
+#######################################################################################################################
+def _reset_region_executor():
+    global _region_executor
+    _region_executor = None
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_region_executor)
+
+# the tesseract configs for each region. --psm 7 treats the region as a single line of text, --psm 6 as a block
+NAME_CONFIG = "--psm 7"
+TYPE_CONFIG = "--psm 7 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ[]"
+DESCRIPTION_CONFIG = "--psm 6"
+ATKDEF_CONFIG = "--psm 7"
+
+# the lowest mean word confidence (0-100) at which adaptive OCR accepts a region read at its cheaper FAST_UPSCALE
+ADAPTIVE_MIN_CONFIDENCE = 75
+
+# the most the brightness of the ATK/DEF region can vary (standard deviation, 0-255) for it to count as blank. Spells
+# and traps have plain card frame there (under 8 on samples/) while a monster's ATK/DEF line is well over 30
+BLANK_ATKDEF_STD = 15
+
+#######################################################################################################################
+# Function that tries the cheap first pass of adaptive OCR on a region: a smaller upscale (FAST_UPSCALE) that's
+# accepted only if tesseract's mean word confidence clears ADAPTIVE_MIN_CONFIDENCE
+# Parameters: the region's name, its grayscale array view, its prepare_* function, the tesseract config and the trace
+# Returns: the ocr data if the fast pass was good enough, otherwise None so the caller runs the full-size pass
+#######################################################################################################################
+def _fast_pass(region, region_view, prepare, config, trace):
+    with trace.stage(f"preprocess_{region}_fast"):
+        img = prepare(region_view, scale=FAST_UPSCALE[region])
+    with trace.stage(f"ocr_{region}_fast"):
+        data = ocr_data(img, config=config)
+
+    # which pass resolved each region is noted on the trace so batch_scan and the benchmark can count them
+    confidence = mean_confidence(data)
+    trace.note(f"confidence_{region}_fast", round(confidence, 1))
+    if confidence < ADAPTIVE_MIN_CONFIDENCE:
+        trace.note(f"pass_{region}", "heavy")
+        return None
+    trace.keep_image(f"preprocessed_{region}", img)
+    trace.note(f"pass_{region}", "fast")
+    return data
+
+#######################################################################################################################
+# Functions that preprocess and extract the data of one region of a card. Each one is independent of the others so
+# they can all run at the same time. Every step is timed and the preprocessed image is kept on the scan's trace
+# Parameters: the region's grayscale array view (see preprocessing/engine.py), the trace for the scan, and whether
+#             to try a cheaper, lower resolution pass first (see _fast_pass)
+# Returns: the cleaned data for that region
+#######################################################################################################################
+def read_name(region_view, trace, adaptive=False):
+    name_data = _fast_pass("name", region_view, prepare_name, NAME_CONFIG, trace) if adaptive else None
+    if name_data is None:
+        with trace.stage("preprocess_name"):
+            name_img = prepare_name(region_view)
+        trace.keep_image("preprocessed_name", name_img)
+        with trace.stage("ocr_name"):
+            name_data = ocr_data(name_img, config=NAME_CONFIG) # perform ocr
+    with trace.stage("extract_name"):
+        raw_name = ocr_text_from_data(name_data, min_conf=50) # parse ocr data into raw text
+        name, confidence = match_catalog_name(raw_name) # correct it to the closest real card name
+    trace.note("name_ocr", raw_name)
+    trace.note("name_confidence", round(confidence, 3))
+    return name
+
+def read_attribute(region_view, trace, adaptive=False):
+    # the attribute icon is matched against templates rather than OCR'd, so it only ever takes one pass
+    with trace.stage("preprocess_attribute"):
+        attribute_img = prepare_attribute(region_view)
+    trace.keep_image("preprocessed_attribute", attribute_img)
+    with trace.stage("classify_attribute"):
+        return classify_attribute(attribute_img) # match the attribute image to its best match in "attribute" folder
+
+def read_monster_type(region_view, trace, adaptive=False):
+    type_data = _fast_pass("type", region_view, prepare_type, TYPE_CONFIG, trace) if adaptive else None
+    if type_data is None:
+        with trace.stage("preprocess_type"):
+            type_img = prepare_type(region_view)
+        trace.keep_image("preprocessed_type", type_img)
+        with trace.stage("ocr_type"):
+            type_data = ocr_data(type_img, config=TYPE_CONFIG) # only recognize the supplied list of characters
+    with trace.stage("extract_type"):
+        type_raw = ocr_text_from_data(type_data, min_conf=45) # keep only words with a certain confidence level
+        return match_monster_type(type_raw) # find the raw text's best match in KNOWN_TYPES
+
+def read_description(region_view, trace, adaptive=False):
+    desc_data = None
+    if adaptive:
+        desc_data = _fast_pass("description", region_view, prepare_description, DESCRIPTION_CONFIG, trace)
+    if desc_data is None:
+        with trace.stage("preprocess_desc"):
+            desc_img = prepare_description(region_view)
+        trace.keep_image("preprocessed_description", desc_img)
+        with trace.stage("ocr_description"):
+            desc_data = ocr_data(desc_img, config=DESCRIPTION_CONFIG) # perform ocr as a block of text
+    with trace.stage("extract_description"):
+        description_raw = ocr_text_from_data(desc_data, min_conf=45) # keep only confident words
+        description = correct_description(description_raw) # fix misread words
+        description = re.sub(r'[\|\=\>\<\&]', '', description) # remove symbols
+        return re.sub(r'\s{2,}', ' ', description).strip() # normalize spacing
+
+def read_atkdef(region_view, trace, adaptive=False):
+    atkdef_raw = None
+    if adaptive:
+        atkdef_data = _fast_pass("atkdef", region_view, prepare_atkdef, ATKDEF_CONFIG, trace)
+        if atkdef_data is not None:
+            atkdef_raw = ocr_text_from_data(atkdef_data, min_conf=0)
+    if atkdef_raw is None:
+        with trace.stage("preprocess_atkdef"):
+            atkdef_img = prepare_atkdef(region_view)
+        trace.keep_image("preprocessed_atkdef", atkdef_img)
+        with trace.stage("ocr_atkdef"):
+            atkdef_raw = ocr_string(atkdef_img, config=ATKDEF_CONFIG).strip() # extract raw ATK/DEF data
+    with trace.stage("extract_atkdef"):
+        atkdef_fixed_labels = fix_atkdef_labels(atkdef_raw)
+        return extract_atk_def_numbers(atkdef_fixed_labels)
+
+#######################################################################################################################
+# Functions that decide which OCR stages a card needs. The attribute icon alone isn't trusted: a monster whose icon is
+# misclassified as SPELL or TRAP still has ink on its ATK/DEF line, so that's read, and an ATK is enough to count it
+# as a monster. Only a card whose icon says spell or trap has to wait for its ATK/DEF before its type is decided
+# Parameters: the results of the stages finished so far (and for _may_have_atkdef, the ATK/DEF region's view)
+# Returns: whether the icon says spell or trap / the stages to wait on before deciding the type / whether the
+#          ATK/DEF or the type might be on the card
+#######################################################################################################################
+def _spell_or_trap_icon(results):
+    return results["attribute"] in ("SPELL", "TRAP")
+
+def _type_waits_on(results):
+    return ["atkdef"] if _spell_or_trap_icon(results) else []
+
+def _may_have_atkdef(region_view, results):
+    return not _spell_or_trap_icon(results) or float(region_view.std()) > BLANK_ATKDEF_STD
+
+def _may_be_monster(results):
+    return not _spell_or_trap_icon(results) or results["atkdef"][0] is not None
+
+#######################################################################################################################
+# Function that reads back which pass of adaptive OCR resolved each region of a scan
+# Parameters: the scan's trace
+# Returns: a dictionary of region name -> "fast" or "heavy" (empty if the scan wasn't adaptive)
+#######################################################################################################################
+def region_passes(trace):
+    return {key[len("pass_"):]: value for key, value in trace.notes.items() if key.startswith("pass_")}
+
+#######################################################################################################################
+# Function that works out the filename of the image being scanned
+# Parameters: a filepath or a PIL image
+# Returns: the non-nested base name of the file, or None for an image that only exists in memory
+#######################################################################################################################
+def _image_filename(image):
+    if isinstance(image, str):
+        return os.path.basename(image)
+    return None
 
 #######################################################################################################################
 # Function used to process an entire card image and extract its individual data
-# Parameters: the filepath to the image to analyze
+# Parameters: the filepath to the image to analyze (or an already opened PIL image, e.g. a card cut out of a binder
+#             page), optionally a trace to record timings on (one is started if not supplied), and whether to use
+#             adaptive OCR, which reads each region at a cheaper resolution first and only falls back to the full
+#             preprocessing if tesseract isn't confident. The trace is added to the recent traces shown on the debug
+#             page when the scan finishes
 # Returns: a dictionary representing the card's information
 #######################################################################################################################
-def process_yugioh_card(image_path):
-    # open the image, crop into each region of the card that has the data we need, and save each crop for debugging
-    original = Image.open(image_path)
-    regions = crop_regions(original)
-    debug_show_crops(regions)
-
-    # ---------- Preprocess each cropped region ----------
-    name_img = preprocess_name(regions["name"])
-    attribute_img = preprocess_attribute(regions["attribute"])
-    type_img = preprocess_type(regions["type"])
-    desc_img = preprocess_desc(regions["description"])
-    atkdef_img = preprocess_atkdef(regions["atkdef"])
-
-    # ---------- Extract name data ----------
-    name_data = ocr_data(name_img, config="--psm 7") # perform ocr. --psm7 treats are a single line of text
-    raw_name = ocr_text_from_data(name_data, min_conf=50) # parse ocr data into raw text
-    name_clean = correct_chars_for_name(raw_name) # clean up the raw text
-
-    # ---------- Attribute ----------
-    attribute = classify_attribute(attribute_img) # match the attribute image to its best match in "attribute" folder
-
-    # ---------- Monster Type ----------
-    # perform ocr and only recognize the supplied list of characters
-    type_data = ocr_data(type_img, config="--psm 7 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ[]")
-    type_raw = ocr_text_from_data(type_data, min_conf=45) # keep only words with a certain confidence level
-    type_clean = match_monster_type(type_raw) # find the raw text's best match in KNOWN_TYPES
-
-    # ---------- DESCRIPTION ----------
-    desc_data = ocr_data(desc_img, config="--psm 6") # perform ocr as a block of text using page segmentation mode 6
-    description_raw = ocr_text_from_data(desc_data, min_conf=45) # keeps only data that meets confidence requirements
-    description = re.sub(r'\b[A-Z]{1,2}\b', '', description_raw) # only keep non-isolated A-Z.
-    description = re.sub(r'[\|\=\>\<\&]', '', description) # remove symbols
-    description = re.sub(r'\s{2,}', ' ', description).strip() # normalize spacing
-
-    # ---------- ATK/DEF ----------
-    atkdef_raw = pytesseract.image_to_string(atkdef_img, config="--psm 7").strip() # extract raw ATK/DEF data
-    atkdef_fixed_labels = fix_atkdef_labels(atkdef_raw)
-    atk, defn = extract_atk_def_numbers(atkdef_fixed_labels)
+def process_yugioh_card(image_path, trace=None, adaptive=False):
+    if trace is None:
+        trace = start_trace(_image_filename(image_path) or "in-memory image")
+    try:
+        return _process_yugioh_card(image_path, trace, adaptive)
+    except Exception as e:
+        trace.note("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        finish_trace(trace)
+
+def _process_yugioh_card(image_path, trace, adaptive):
+    # decode the image and convert it to grayscale once, then slice out each region of the card that has the data
+    # we need. The regions are views into that one buffer, so cropping copies nothing
+    with trace.stage("decode"):
+        gray = decode_gray(image_path)
+    with trace.stage("crop"):
+        regions = region_views(gray)
+    trace.keep_images(regions, prefix="crop_")
+
+    # ---------- Preprocess and extract every region as a graph of stages ----------
+    # stages without dependencies all start at once. The attribute icon takes milliseconds to classify, and a monster
+    # icon starts the ATK/DEF and type OCR straight away. A spell or trap icon with a blank ATK/DEF line skips both
+    # OCRs. If the line isn't blank it's read, and the type is only read if an ATK was found there
+    graph = StageGraph()
+    graph.add("attribute", partial(read_attribute, regions["attribute"], trace, adaptive))
+    graph.add("name", partial(read_name, regions["name"], trace, adaptive))
+    graph.add("description", partial(read_description, regions["description"], trace, adaptive))
+    graph.add("atkdef", partial(read_atkdef, regions["atkdef"], trace, adaptive),
+              after=["attribute"], when=partial(_may_have_atkdef, regions["atkdef"]), skipped=(None, None))
+    graph.add("type", partial(read_monster_type, regions["type"], trace, adaptive),
+              after=["attribute"], also_after=_type_waits_on, when=_may_be_monster, skipped="")
+
+    # ---------- Join the results. run() re-raises any error from the region that failed ----------
+    results, skipped = graph.run(_get_region_executor())
+    if skipped:
+        trace.note("skipped", ", ".join(sorted(skipped)))
+    name_clean = results["name"]
+    attribute = results["attribute"]
+    type_clean = results["type"]
+    description = results["description"]
+    atk, defn = results["atkdef"]
+
+    # a card with an ATK is a monster, so an icon classified as SPELL or TRAP was misread. Leave the attribute blank
+    # for the user to fill in rather than save a wrong one
+    if atk is not None and attribute in ("SPELL", "TRAP"):
+        trace.note("attribute_overridden", attribute)
+        attribute = None
 
     # ----------IMAGE FILEPATH -----
-    filename = os.path.basename(image_path) # only keep non-nested base name
+    filename = _image_filename(image_path) # only keep non-nested base name
 
     # ---------- CARD TYPE ----------
     # if the card has an attack value, it's type is a monster. otherwise match its type with its attribute
@@ -96,3 +286,20 @@ def process_yugioh_card(image_path):
         "card_type": card_type,
         "image_filename": filename
     }
+
+#######################################################################################################################
+# Function used to process a card image, reusing the stored result if this exact image has been scanned before
+# Parameters: the filepath to the image to analyze
+# Returns: a dictionary representing the card's information
+#######################################################################################################################
+def process_yugioh_card_cached(image_path):
+    # the cache is keyed by the SHA-256 of the image's bytes, so a re-upload under any filename is a hit
+    image_hash = file_digest(image_path)
+    card = get_cached_scan(image_hash)
+    if card is None:
+        card = process_yugioh_card(image_path)
+        store_scan(image_hash, card)
+
+    # the cached copy may have been saved under a different filename, so always point at this upload
+    card["image_filename"] = os.path.basename(image_path)
+    return card
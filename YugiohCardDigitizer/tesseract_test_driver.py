@@ -10,14 +10,21 @@
 # imports
 import os
 from tesseract import process_yugioh_card
+from YugiohCardDigitizer.utils.tracing import start_trace
 
 # defines the directory to search for images in
 image_path = "samples/blue_eyes.png"  # represents the path to the image to test
 
 # defines a function that loops through all images in the scan directory and attempt to extra card data from them
 def main():
-    result = process_yugioh_card(image_path)
+    trace = start_trace(image_path)
+    result = process_yugioh_card(image_path, trace)
     print(result)
 
+    # print how long each stage of the pipeline took
+    for stage, seconds in trace.timings:
+        print(f"{stage:<22}{seconds:.4f}s")
+    print(f"{'total':<22}{trace.total_seconds:.4f}s")
+
 if __name__ == "__main__":
     main()
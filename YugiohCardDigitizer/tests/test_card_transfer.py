@@ -0,0 +1,107 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: tests that a bulk import over cards already in the library leaves search and filtering
+#                         agreeing with the cards table, since an import keeps their tables up to date itself
+#######################################################################################################################
+# Run from the project root, with the YugiohCardDigitizer folder on the path for its top level modules:
+#     PYTHONPATH=YugiohCardDigitizer python -m unittest discover YugiohCardDigitizer/tests
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+# the tests run against a copy of the library, which has to be chosen before the app is imported
+_temp_dir = tempfile.TemporaryDirectory()
+TEST_DB = os.path.join(_temp_dir.name, "Cards.sqlite3")
+os.environ["YUGIOH_CARDS_DB"] = TEST_DB
+
+from YugiohCardDigitizer.data_layer.card_filters import FACETS
+from YugiohCardDigitizer.data_layer.card_transfer import import_cards
+from YugiohCardDigitizer.data_layer.database import BASE_DIR
+from YugiohCardDigitizer.main import app
+
+#######################################################################################################################
+# Functions that copy the real library for the tests to change, and throw the copy away afterwards
+#######################################################################################################################
+def setUpModule():
+    source = sqlite3.connect(f"file:{os.path.join(BASE_DIR, 'Cards.sqlite3')}?mode=ro", uri=True)
+    target = sqlite3.connect(TEST_DB)
+    source.backup(target)
+    source.close()
+    target.close()
+
+def tearDownModule():
+    _temp_dir.cleanup()
+
+#######################################################################################################################
+# Class testing an import over existing cards, with the search index and facet tables already built
+#######################################################################################################################
+class ImportConsistencyTest(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        # searching and filtering once builds their tables, so the import has to keep them up to date
+        self.client.get("/search?q=dragon&format=json")
+        self.client.get("/filter")
+
+    # runs a query against the test library directly, not through the app
+    def query(self, sql, parameters=()):
+        with sqlite3.connect(TEST_DB) as db:
+            return db.execute(sql, parameters).fetchall()
+
+    def search(self, text):
+        return [card["name"] for card in self.client.get(f"/search?q={text}&format=json").json["results"]]
+
+    def filter_names(self, query_string):
+        return [card["name"] for card in self.client.get(f"/filter?{query_string}&limit=200").json["cards"]]
+
+    # checks that the facet counts and the search index match the cards table exactly
+    def assert_consistent(self):
+        facets = self.client.get("/filter").json["facets"]
+        for facet in FACETS:
+            expected = self.query(f"""SELECT lower({facet}), COUNT(*) FROM cards WHERE {facet} IS NOT NULL
+                                      GROUP BY {facet} COLLATE NOCASE ORDER BY 1""")
+            actual = sorted((value.lower(), count) for value, count in facets[facet].items())
+            self.assertEqual(actual, [tuple(row) for row in expected], facet)
+
+        self.assertEqual(self.client.get("/filter").json["total"], self.query("SELECT COUNT(*) FROM cards")[0][0])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM cards_fts"), self.query("SELECT COUNT(*) FROM cards"))
+        self.query("INSERT INTO cards_fts (cards_fts) VALUES ('integrity-check')")
+
+    def test_import_over_existing_cards(self):
+        result = import_cards(enumerate([
+            # an existing card that changes attribute and description
+            {"name": "Dark Magician", "card_type": "Monster", "monster_type": "Spellcaster", "attack": "2500",
+             "defense": "2100", "attribute": "LIGHT", "description": "A reformed wizard of zanzibar."},
+            # a new card twice in the same batch. The last row is the one kept
+            {"name": "Pot of Greed", "card_type": "Trap", "description": "Draw 2 cards."},
+            {"name": "Pot of Greed", "card_type": "Spell", "description": "Draw 2 cards from your deck."},
+            # a row that can't be imported
+            {"name": "", "card_type": "Spell"},
+        ], start=2))
+
+        self.assertEqual(result["imported"], 2)
+        self.assertEqual(result["skipped"], 1)
+        self.assertEqual(self.query("SELECT COUNT(*) FROM cards WHERE name = 'Pot of Greed'"), [(1,)])
+
+        self.assertEqual(self.search("zanzibar"), ["Dark Magician"])
+        self.assertEqual(self.search("ultimate"), [])
+        self.assertEqual(self.search("greed"), ["Pot of Greed"])
+
+        self.assertIn("Dark Magician", self.filter_names("attribute=LIGHT"))
+        self.assertNotIn("Dark Magician", self.filter_names("attribute=DARK"))
+        self.assertIn("Pot of Greed", self.filter_names("card_type=Spell"))
+        self.assertNotIn("Pot of Greed", self.filter_names("card_type=Trap"))
+        self.assert_consistent()
+
+        # importing the same cards again changes nothing
+        import_cards(enumerate([{"name": "Pot of Greed", "card_type": "Spell",
+                                 "description": "Draw 2 cards from your deck."}], start=2))
+        self.assertEqual(self.search("greed"), ["Pot of Greed"])
+        self.assert_consistent()
+
+if __name__ == "__main__":
+    unittest.main()
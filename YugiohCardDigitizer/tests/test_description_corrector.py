@@ -0,0 +1,39 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: tests that correcting a card's description fixes misread words without losing real ones
+#######################################################################################################################
+# Run from the project root, with the YugiohCardDigitizer folder on the path for its top level modules:
+#     PYTHONPATH=YugiohCardDigitizer python -m unittest discover YugiohCardDigitizer/tests
+
+import unittest
+
+from YugiohCardDigitizer.extractors.description_corrector import MIN_VOCABULARY_SIZE, SpellIndex, correct_description
+
+# words of real card text, padded out with made up words so the vocabulary is big enough to be corrected against
+CARD_TEXT = "When this card is destroyed by battle and sent to the Graveyard, your opponent takes damage. "
+FILLER = " ".join(f"filler{chr(97 + i // 26 % 26)}{chr(97 + i % 26)}{i}" for i in range(MIN_VOCABULARY_SIZE))
+
+#######################################################################################################################
+# Class testing that short words survive correction and long misread words are fixed
+#######################################################################################################################
+class DescriptionCorrectorTest(unittest.TestCase):
+    def test_short_words_survive_the_shipped_catalog(self):
+        self.assertEqual(correct_description("You gain 1000 LP."), "You gain 1000 LP.")
+        self.assertEqual(correct_description("If I destroy it, send it to the GY. OK"),
+                         "If I destroy it, send it to the GY. OK")
+
+    def test_short_words_survive_a_large_vocabulary(self):
+        index = SpellIndex([CARD_TEXT, FILLER])
+        self.assertGreaterEqual(len(index), MIN_VOCABULARY_SIZE)
+        self.assertEqual(index.correct_text("If I lift it, gain 1000 LP and send it to the GY"),
+                         "If I lift it, gain 1000 LP and send it to the GY")
+
+    def test_long_misread_words_are_corrected(self):
+        index = SpellIndex([CARD_TEXT, FILLER])
+        self.assertEqual(index.correct_text("destroyd by batt1e"), "destroyed by battle")
+
+if __name__ == "__main__":
+    unittest.main()
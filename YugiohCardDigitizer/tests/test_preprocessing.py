@@ -0,0 +1,108 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: tests that the preprocessing engine's output stays close to the Pillow filter chains it
+#                         replaced, which are kept here as the reference, for every card in samples/. Both start from
+#                         the same grayscale decode, so only the filters are compared
+#######################################################################################################################
+# Run from the project root, with the YugiohCardDigitizer folder on the path for its top level modules:
+#     PYTHONPATH=YugiohCardDigitizer python -m unittest discover YugiohCardDigitizer/tests
+
+import os
+import unittest
+
+import numpy as np
+from PIL import Image, ImageEnhance, ImageFilter, ImageOps
+
+from YugiohCardDigitizer.extractors.attribute_classifier import classify_attribute
+from YugiohCardDigitizer.preprocessing.cropping import region_boxes
+from YugiohCardDigitizer.preprocessing.engine import (decode_gray, prepare_atkdef, prepare_attribute,
+                                                      prepare_description, prepare_name, prepare_type, region_views)
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(__file__))
+SAMPLES_DIR = os.path.join(PROJECT_DIR, "samples")
+ATTRIBUTES_DIR = os.path.join(PROJECT_DIR, "attributes")
+
+# the most the mean pixel (0-255) of a region may differ from the reference. Filters that ran on the enlarged image
+# now run before the upscale, and the description no longer has a median filter at all, so only the name is
+# bit-exact (see the prepare_* functions)
+MAX_MEAN_DIFFERENCE = {"name": 0.0, "type": 3.0, "description": 3.5, "atkdef": 3.0}
+
+#######################################################################################################################
+# Functions holding the filter chains the app used before the preprocessing engine, for comparing against
+# Parameters: a region cropped from the grayscale card
+# Returns: the preprocessed region as a PIL image
+#######################################################################################################################
+def reference_name(img):
+    gray = ImageOps.autocontrast(img.convert("L"))
+    gray = gray.filter(ImageFilter.MedianFilter(3))
+    gray = gray.filter(ImageFilter.UnsharpMask(radius=1, percent=150))
+    return gray.resize((gray.width * 3, gray.height * 3), Image.LANCZOS)
+
+def reference_type(img):
+    gray = ImageOps.autocontrast(img.convert("L"))
+    gray = gray.resize((gray.width * 6, gray.height * 6), Image.LANCZOS)
+    gray = gray.filter(ImageFilter.MedianFilter(3))
+    gray = gray.filter(ImageFilter.UnsharpMask(radius=1, percent=250))
+    return ImageEnhance.Contrast(gray).enhance(1.5)
+
+def reference_description(img):
+    gray = img.convert("L")
+    gray = gray.resize((gray.width * 2, gray.height * 2), Image.LANCZOS)
+    return gray.filter(ImageFilter.MedianFilter(3))
+
+def reference_atkdef(img):
+    gray = ImageOps.autocontrast(img.convert("L"))
+    gray = gray.resize((gray.width * 3, gray.height * 3), Image.LANCZOS)
+    return gray.filter(ImageFilter.UnsharpMask(radius=1, percent=150))
+
+def reference_attribute(img):
+    img = img.resize((img.width * 2, img.height * 2), Image.LANCZOS)
+    img = img.filter(ImageFilter.MedianFilter(size=3))
+    return ImageOps.autocontrast(img, cutoff=4)
+
+REFERENCES = {"name": reference_name, "type": reference_type, "description": reference_description,
+              "atkdef": reference_atkdef}
+PREPARERS = {"name": prepare_name, "type": prepare_type, "description": prepare_description,
+             "atkdef": prepare_atkdef}
+
+#######################################################################################################################
+# Function that lists the sample card images
+# Returns: a list of filepaths
+#######################################################################################################################
+def sample_images():
+    return [os.path.join(SAMPLES_DIR, name) for name in sorted(os.listdir(SAMPLES_DIR))
+            if name.lower().endswith((".png", ".jpg", ".jpeg"))]
+
+#######################################################################################################################
+# Class comparing every region of every sample card with its reference chain
+#######################################################################################################################
+class PreprocessingEngineTest(unittest.TestCase):
+    def test_regions_match_the_reference_chains(self):
+        for path in sample_images():
+            gray = decode_gray(path)
+            views = region_views(gray)
+            card = Image.fromarray(gray)
+            crops = {key: card.crop(box) for key, box in region_boxes(*card.size).items()}
+
+            for region, prepare in PREPARERS.items():
+                with self.subTest(card=os.path.basename(path), region=region):
+                    actual = np.asarray(prepare(views[region]), dtype=np.int16)
+                    expected = np.asarray(REFERENCES[region](crops[region]), dtype=np.int16)
+                    self.assertEqual(actual.shape, expected.shape)
+                    self.assertLessEqual(np.abs(actual - expected).mean(), MAX_MEAN_DIFFERENCE[region])
+
+    def test_attributes_classify_the_same(self):
+        for path in sample_images():
+            gray = decode_gray(path)
+            views = region_views(gray)
+            card = Image.fromarray(gray)
+            crop = card.crop(region_boxes(*card.size)["attribute"])
+            with self.subTest(card=os.path.basename(path)):
+                self.assertEqual(classify_attribute(prepare_attribute(views["attribute"]), ATTRIBUTES_DIR),
+                                 classify_attribute(reference_attribute(crop), ATTRIBUTES_DIR))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: tests that the stage scheduler only waits on a stage when the results so far call for it
+#######################################################################################################################
+# Run from the project root, with the YugiohCardDigitizer folder on the path for its top level modules:
+#     PYTHONPATH=YugiohCardDigitizer python -m unittest discover YugiohCardDigitizer/tests
+
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from YugiohCardDigitizer.utils.stage_graph import StageGraph
+
+#######################################################################################################################
+# Class testing conditional dependencies (also_after) and skipped stages
+#######################################################################################################################
+class StageGraphTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.started = []
+        self.slow_release = threading.Event()
+
+    def tearDown(self):
+        self.slow_release.set()
+        self.executor.shutdown()
+
+    # builds the scan's attribute -> atkdef/type graph with a slow atkdef that finishes only once released
+    def graph(self, icon):
+        def slow():
+            return 3000 if self.slow_release.wait(2) else None
+
+        def record(name, func):
+            def run():
+                self.started.append(name)
+                return func()
+            return run
+
+        graph = StageGraph()
+        graph.add("attribute", record("attribute", lambda: icon))
+        graph.add("atkdef", record("atkdef", slow), after=["attribute"])
+        graph.add("type", record("type", lambda: self.slow_release.set() or "Dragon"), after=["attribute"],
+                  also_after=lambda results: ["atkdef"] if results["attribute"] == "SPELL" else [],
+                  when=lambda results: results["attribute"] != "SPELL" or results["atkdef"] is not None,
+                  skipped="")
+        return graph
+
+    def test_monster_type_does_not_wait_on_atkdef(self):
+        # type releases atkdef, so this only finishes if type started while atkdef was still running
+        results, skipped = self.graph("DARK").run(self.executor)
+        self.assertEqual(results, {"attribute": "DARK", "atkdef": 3000, "type": "Dragon"})
+        self.assertEqual(skipped, set())
+
+    def test_spell_type_waits_on_atkdef(self):
+        self.slow_release.set()
+        results, _ = self.graph("SPELL").run(self.executor)
+        self.assertEqual(self.started.index("type"), len(self.started) - 1)
+        self.assertEqual(results["type"], "Dragon")
+
+    def test_stage_waiting_on_a_missing_stage_raises(self):
+        graph = StageGraph()
+        graph.add("attribute", lambda: "SPELL")
+        graph.add("type", lambda: "Dragon", after=["attribute"], also_after=lambda results: ["atkdef"])
+        with self.assertRaises(ValueError):
+            graph.run(self.executor)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,219 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines how static files are cached by browsers. Stylesheets and scripts are copied under
+#                         a name holding a hash of their contents (e.g. app.3f2a1b9c0d.css) along with gzip and
+#                         brotli compressed versions, so they can be cached forever: any change gives a new name
+#######################################################################################################################
+# Run this file directly to build every stylesheet and script ahead of time (otherwise each one is built the first
+# time a page links to it):
+#     python -m YugiohCardDigitizer.utils.assets build
+
+import gzip             # for the gzip compressed versions
+import hashlib          # for fingerprinting an asset's contents
+import json             # for reading and writing the manifest
+import mimetypes        # for serving a compressed file as the type of the original
+import os
+import re               # for recognising content addressed card images
+import shutil           # for copying source maps
+import sys
+import threading
+
+from flask import request, send_from_directory
+
+from YugiohCardDigitizer.utils.files import write_file
+from YugiohCardDigitizer.utils.thumbnails import STATIC_DIR
+
+# brotli is optional. It compresses stylesheets and scripts around 15% smaller than gzip, and every current browser
+# accepts it. Without it only the gzip versions are made
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DIST_DIR = os.path.join(STATIC_DIR, "dist")                     # where the fingerprinted copies are saved
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")        # which copy is the current one for each asset
+
+# the kinds of static file that are fingerprinted
+ASSET_EXTENSIONS = (".css", ".js")
+
+# how many hex digits of the SHA-256 go in a fingerprinted name
+FINGERPRINT_LENGTH = 10
+
+# how long browsers may keep a file that can never change without getting a new name (a year, the most they honour)
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# the compressed versions served instead of the file, best first, by Content-Encoding and their file extension
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# card images saved since images were content addressed (see data_layer.image_store) are named by the SHA-256 of
+# their bytes, and their thumbnails by the image's name, so they can be cached forever too
+CONTENT_ADDRESSED_PATTERN = re.compile(r"images/cards/(thumbs/)?[0-9a-f]{64}\.")
+
+#######################################################################################################################
+# Function that makes the fingerprinted copy of an asset and its compressed versions, unless they're already there
+# Parameters: the asset's path relative to the static folder
+# Returns: the copy's path relative to the static folder
+#######################################################################################################################
+def build_asset(path):
+    source = os.path.join(STATIC_DIR, path)
+    with open(source, "rb") as f:
+        data = f.read()
+
+    stem, extension = os.path.splitext(path)
+    fingerprint = hashlib.sha256(data).hexdigest()[:FINGERPRINT_LENGTH]
+    built_path = f"dist/{stem}.{fingerprint}{extension}"
+    target = os.path.join(STATIC_DIR, built_path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+
+    # the same contents always get the same name, so a copy that's there is already right
+    if not os.path.exists(target):
+        # mtime=0 keeps the gzip bytes the same every time they're built
+        write_file(f"{target}.gz", gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            write_file(f"{target}.br", brotli.compress(data, quality=11))
+        write_file(target, data)
+
+        # a source map is found relative to the file, by its original name
+        source_map = f"{source}.map"
+        if os.path.exists(source_map):
+            shutil.copyfile(source_map, os.path.join(os.path.dirname(target), os.path.basename(source_map)))
+    return built_path
+
+#######################################################################################################################
+# Class holding the manifest: for each asset, its fingerprinted copy and the size and modification time the source
+# had when it was built. A source that has changed since is built again the next time a page links to it, so editing
+# a stylesheet never needs a separate build step or leaves browsers on the old copy
+#######################################################################################################################
+class AssetManifest:
+    def __init__(self, manifest_path):
+        self.manifest_path = manifest_path
+        self._lock = threading.Lock()
+        self._entries = None    # asset path -> {"file", "size", "mtime_ns"}, loaded the first time it's needed
+
+    # loads the saved manifest, or starts an empty one
+    def _load(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        write_file(self.manifest_path, json.dumps(self._entries, indent=2, sort_keys=True).encode("utf-8"))
+
+    # returns the fingerprinted copy of an asset, building it first if it's missing or out of date. None for a file
+    # that isn't an asset or doesn't exist
+    def lookup(self, path):
+        if not path.endswith(ASSET_EXTENSIONS) or path.startswith("dist/"):
+            return None
+        try:
+            stat = os.stat(os.path.join(STATIC_DIR, path))
+        except OSError:
+            return None
+
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+            entry = self._entries.get(path)
+            if (entry is None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns
+                    or not os.path.exists(os.path.join(STATIC_DIR, entry["file"]))):
+                entry = {"file": build_asset(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+                self._entries[path] = entry
+                self._save()
+            return entry["file"]
+
+    # returns the fingerprinted copies in the manifest, relative to the static folder
+    def files(self):
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+            return {entry["file"] for entry in self._entries.values()}
+
+    # forgets the loaded manifest. Used in a forked child process, which mustn't share the parent's lock
+    def reset(self):
+        self._lock = threading.Lock()
+        self._entries = None
+
+# the manifest shared by every request in this process
+asset_manifest = AssetManifest(MANIFEST_PATH)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=asset_manifest.reset)
+
+#######################################################################################################################
+# Function that finds the path pages should link to for a static file
+# Parameters: the file's path relative to the static folder
+# Returns: its fingerprinted copy for a stylesheet or script, otherwise the path it was given
+#######################################################################################################################
+def asset_path(path):
+    return asset_manifest.lookup(path) or path
+
+#######################################################################################################################
+# Function that serves a static file, in place of Flask's own static route. Fingerprinted copies and content addressed
+# card images are cached for a year without browsers ever checking back, and a fingerprinted copy is sent compressed
+# when the browser accepts it. Anything else is checked back on every time, and only sent again if it has changed
+# Parameters: the file's path relative to the static folder
+# Returns: the file's response
+#######################################################################################################################
+def send_static(filename):
+    if filename.startswith("dist/") and filename.endswith(ASSET_EXTENSIONS):
+        served = filename
+        encoding = None
+        for candidate, extension in ENCODINGS:
+            if request.accept_encodings[candidate] and os.path.exists(os.path.join(STATIC_DIR, filename + extension)):
+                served = filename + extension
+                encoding = candidate
+                break
+        response = send_from_directory(STATIC_DIR, served, mimetype=mimetypes.guess_type(filename)[0],
+                                       max_age=IMMUTABLE_MAX_AGE)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+    elif CONTENT_ADDRESSED_PATTERN.match(filename):
+        response = send_from_directory(STATIC_DIR, filename, max_age=IMMUTABLE_MAX_AGE)
+    else:
+        return send_from_directory(STATIC_DIR, filename)
+    response.cache_control.immutable = True
+    return response
+
+#######################################################################################################################
+# Function that builds every stylesheet and script in the static folder and deletes copies no longer in use
+# Parameters: none
+# Returns: a tuple of (assets built, old files deleted)
+#######################################################################################################################
+def build_all():
+    built = 0
+    for root, dirs, files in os.walk(STATIC_DIR):
+        if os.path.abspath(root) == os.path.abspath(STATIC_DIR):
+            dirs[:] = [d for d in dirs if d not in ("dist", "images")]
+        for name in files:
+            path = os.path.relpath(os.path.join(root, name), STATIC_DIR).replace(os.sep, "/")
+            if asset_manifest.lookup(path):
+                built += 1
+
+    # everything a current copy needs: itself, its compressed versions, source maps and the manifest
+    keep = {os.path.normpath(MANIFEST_PATH)}
+    for built_path in asset_manifest.files():
+        copy = os.path.normpath(os.path.join(STATIC_DIR, built_path))
+        keep.update({copy, f"{copy}.gz", f"{copy}.br"})
+    deleted = 0
+    for root, _, files in os.walk(DIST_DIR):
+        for name in files:
+            path = os.path.normpath(os.path.join(root, name))
+            if path not in keep and not name.endswith(".map"):
+                os.remove(path)
+                deleted += 1
+    return built, deleted
+
+# if the file is run directly, build every asset
+if __name__ == "__main__":
+    if sys.argv[1:] != ["build"]:
+        print("usage: python -m YugiohCardDigitizer.utils.assets build")
+        sys.exit(1)
+    built, deleted = build_all()
+    print(f"Built {built} asset(s), deleted {deleted} old file(s). Compression: gzip"
+          f"{' and brotli' if brotli is not None else ' (install brotli for brotli too)'}.")
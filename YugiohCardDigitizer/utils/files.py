@@ -0,0 +1,35 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines how files are written so nobody ever sees one half-written: each is written under a
+#                         temporary name and then swapped in
+#######################################################################################################################
+
+import os
+import threading
+
+#######################################################################################################################
+# Function that works out a temporary name to write a file under before swapping it in. It's unique to the process
+# and thread, so two requests saving the same file at once never write into each other's temporary file
+# Parameters: the file's final path
+# Returns: the temporary path, in the same folder so the swap is a rename
+#######################################################################################################################
+def temp_path_for(path):
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+#######################################################################################################################
+# Function that writes a file under a temporary name and swaps it in
+# Parameters: the filepath and the bytes to write
+# Returns: void
+#######################################################################################################################
+def write_file(path, data):
+    temp_path = temp_path_for(path)
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,86 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines a small scheduler that runs the stages of a scan as a dependency graph, so cheap
+#                         stages can decide whether the expensive stages after them need to run at all
+#######################################################################################################################
+
+from concurrent.futures import FIRST_COMPLETED, wait   # for reacting to each stage the moment it finishes
+
+#######################################################################################################################
+# Class describing one stage of the graph: the work to run, the stages it waits on (some only depending on the results
+# of others), and an optional condition on their results that decides whether it runs or is skipped
+#######################################################################################################################
+class Stage:
+    def __init__(self, name, func, after=(), when=None, skipped=None, also_after=None):
+        self.name = name
+        self.func = func            # called with no arguments. Use functools.partial to bind its inputs
+        self.after = tuple(after)   # the names of the stages that must finish first
+        self.when = when            # called with the results so far. The stage is skipped if it returns False
+        self.skipped = skipped      # the result a skipped stage gives
+        self.also_after = also_after    # called with the results once the after stages have finished. Returns the
+                                        # names of any more stages to wait on before when is checked
+
+    # returns the names of the stages this one still has to wait on, given the results so far
+    def waiting_on(self, results):
+        dependencies = [dependency for dependency in self.after if dependency not in results]
+        if not dependencies and self.also_after is not None:
+            dependencies = [dependency for dependency in self.also_after(results) if dependency not in results]
+        return dependencies
+
+#######################################################################################################################
+# Class holding the stages of a scan and running them on an executor. Every stage starts as soon as the stages it
+# waits on have finished, so independent stages run at the same time
+#######################################################################################################################
+class StageGraph:
+    def __init__(self):
+        self.stages = {}
+
+    # adds a stage. See Stage for the meaning of each parameter. Returns the graph so calls can be chained
+    def add(self, name, func, after=(), when=None, skipped=None, also_after=None):
+        if name in self.stages:
+            raise ValueError(f"Stage {name!r} was added twice")
+        for dependency in after:
+            if dependency not in self.stages:
+                raise ValueError(f"Stage {name!r} waits on {dependency!r}, which must be added before it")
+        self.stages[name] = Stage(name, func, after, when, skipped, also_after)
+        return self
+
+    # runs every stage and waits for them all to finish. The first error raised by a stage is re-raised here
+    # returns (a dictionary of stage name -> result, the set of names of the stages that were skipped)
+    def run(self, executor):
+        results = {}
+        skipped = set()
+        running = {}    # future -> stage name
+        waiting = list(self.stages.values())
+
+        while waiting or running:
+            # start (or skip) every waiting stage whose dependencies have all finished. Skipping a stage can free up
+            # the ones waiting on it, so keep going until nothing else changes
+            progressed = True
+            while progressed:
+                progressed = False
+                for stage in list(waiting):
+                    if stage.waiting_on(results):
+                        continue
+                    waiting.remove(stage)
+                    progressed = True
+                    if stage.when is not None and not stage.when(results):
+                        results[stage.name] = stage.skipped
+                        skipped.add(stage.name)
+                    else:
+                        running[executor.submit(stage.func)] = stage.name
+
+            if not running:
+                # only a stage waiting on one that isn't in the graph can be left over
+                if waiting:
+                    raise ValueError(f"Stages {[stage.name for stage in waiting]} wait on stages that never finish")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+
+        return results, skipped
@@ -0,0 +1,162 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines the small, resized copies (thumbnails) of every card image that pages show instead
+#                         of the full-size upload, each saved as both a JPEG and a smaller WebP
+#######################################################################################################################
+# Run this file directly to create thumbnails for images uploaded before thumbnails existed:
+#     python -m YugiohCardDigitizer.utils.thumbnails backfill
+
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor  # for creating thumbnails without slowing down uploads
+
+from PIL import Image
+
+from YugiohCardDigitizer.preprocessing.normalize import open_image
+from YugiohCardDigitizer.utils.files import temp_path_for
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(__file__))                    # the YugiohCardDigitizer folder
+STATIC_DIR = os.path.join(PROJECT_DIR, "static")                            # the folder Flask serves static files from
+CARDS_DIR = os.path.join(STATIC_DIR, "images", "cards")                     # where uploaded card images are saved
+THUMBS_DIR = os.path.join(CARDS_DIR, "thumbs")                              # where their thumbnails are saved
+
+# the widths thumbnails are made at. Pages ask for one and use the next size up on high resolution screens
+THUMBNAIL_WIDTHS = (200, 400)
+
+# the formats each thumbnail is saved in, with their save options. Browsers that support WebP get the smaller file
+THUMBNAIL_FORMATS = {
+    "jpg": {"format": "JPEG", "quality": 85, "optimize": True, "progressive": True},
+    "webp": {"format": "WEBP", "quality": 80, "method": 6},
+}
+
+# a single background thread is plenty. Thumbnails are quick to make and uploads only come in one at a time
+_thumbnail_executor = None
+_thumbnail_executor_lock = threading.Lock()
+
+#######################################################################################################################
+# Function that works out where a thumbnail of a card image is saved
+# Parameters: the card image's filename, the thumbnail's width and its format ("jpg" or "webp")
+# Returns: the thumbnail's filepath
+#######################################################################################################################
+def thumbnail_path(image_filename, width, fmt="jpg"):
+    # the full filename is kept (e.g. kuriboh.jpg.200.webp) so kuriboh.png and kuriboh.jpg can't share a thumbnail
+    return os.path.join(THUMBS_DIR, f"{image_filename}.{width}.{fmt}")
+
+#######################################################################################################################
+# Function that works out the static path of a thumbnail for use in a template, if it has been made yet
+# Parameters: the card image's filename, the thumbnail's width and its format ("jpg" or "webp")
+# Returns: the path relative to the static folder (for url_for('static', filename=...)), or None if there isn't one
+#######################################################################################################################
+def thumbnail_static_path(image_filename, width, fmt="jpg"):
+    if not image_filename:
+        return None
+    path = thumbnail_path(image_filename, width, fmt)
+    if not os.path.exists(path):
+        return None
+    return os.path.relpath(path, STATIC_DIR).replace(os.sep, "/")
+
+#######################################################################################################################
+# Function that creates every thumbnail of a card image, skipping ones already newer than the image
+# Parameters: the card image's filename (inside static/images/cards)
+# Returns: the number of thumbnails created
+#######################################################################################################################
+def create_thumbnails(image_filename):
+    source = os.path.join(CARDS_DIR, image_filename)
+    source_mtime = os.path.getmtime(source)
+    targets = [(width, fmt) for width in THUMBNAIL_WIDTHS for fmt in THUMBNAIL_FORMATS
+               if not os.path.exists(thumbnail_path(image_filename, width, fmt))
+               or os.path.getmtime(thumbnail_path(image_filename, width, fmt)) < source_mtime]
+    if not targets:
+        return 0
+
+    os.makedirs(THUMBS_DIR, exist_ok=True)
+
+    # decode once, no bigger than the largest thumbnail needs, then shrink a copy for each width
+    largest = max(width for width, _ in targets)
+    with Image.open(source) as img:
+        img = open_image(img, mode="RGB", min_size=(largest, 1))
+        for width in sorted({width for width, _ in targets}, reverse=True):
+            # never enlarge a small image. Its thumbnail is just a re-encoded copy
+            height = max(1, round(img.height * width / img.width)) if img.width > width else img.height
+            resized = img.resize((min(width, img.width), height), Image.LANCZOS) if img.width > width else img
+            for fmt in (fmt for w, fmt in targets if w == width):
+                # write to a temporary name and swap it in, so a page never sees a half-written thumbnail
+                path = thumbnail_path(image_filename, width, fmt)
+                temp_path = temp_path_for(path)
+                resized.save(temp_path, **THUMBNAIL_FORMATS[fmt])
+                os.replace(temp_path, path)
+    return len(targets)
+
+#######################################################################################################################
+# Function that deletes every thumbnail of a card image
+# Parameters: the card image's filename
+# Returns: void
+#######################################################################################################################
+def delete_thumbnails(image_filename):
+    for width in THUMBNAIL_WIDTHS:
+        for fmt in THUMBNAIL_FORMATS:
+            path = thumbnail_path(image_filename, width, fmt)
+            if os.path.exists(path):
+                os.remove(path)
+
+#######################################################################################################################
+# Function that returns the background thread thumbnails are made on, creating it the first time it's needed
+# Parameters: none
+# Returns: the ThreadPoolExecutor thumbnails are made on
+#######################################################################################################################
+def _get_thumbnail_executor():
+    global _thumbnail_executor
+    with _thumbnail_executor_lock:
+        if _thumbnail_executor is None:
+            _thumbnail_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumbnails")
+        return _thumbnail_executor
+
+#######################################################################################################################
+# Function that makes thumbnails in the background and reports any error instead of losing it
+# Parameters: the card image's filename
+# Returns: void
+#######################################################################################################################
+def _create_thumbnails_quietly(image_filename):
+    try:
+        create_thumbnails(image_filename)
+    except Exception as e:
+        print(f"THUMBNAIL ERROR ({image_filename}):", e)
+
+#######################################################################################################################
+# Function that queues a newly saved card image to have its thumbnails made in the background. Until they're ready,
+# pages fall back to the full-size image
+# Parameters: the card image's filename
+# Returns: void
+#######################################################################################################################
+def queue_thumbnails(image_filename):
+    if image_filename:
+        _get_thumbnail_executor().submit(_create_thumbnails_quietly, image_filename)
+
+#######################################################################################################################
+# Function that creates any missing or outdated thumbnails for every card image already saved
+# Parameters: none
+# Returns: a tuple of (images checked, thumbnails created)
+#######################################################################################################################
+def backfill_thumbnails():
+    checked = created = 0
+    for filename in sorted(os.listdir(CARDS_DIR)):
+        if not os.path.isfile(os.path.join(CARDS_DIR, filename)):
+            continue
+        try:
+            created += create_thumbnails(filename)
+            checked += 1
+        except Exception as e:
+            print(f"Skipped {filename}: {e}")
+    return checked, created
+
+# if the file is run directly, backfill thumbnails
+if __name__ == "__main__":
+    if sys.argv[1:] != ["backfill"]:
+        print("usage: python -m YugiohCardDigitizer.utils.thumbnails backfill")
+        sys.exit(1)
+    checked, created = backfill_thumbnails()
+    print(f"Created {created} thumbnail(s) for {checked} card image(s).")
@@ -0,0 +1,112 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines a tracing facility that times every stage of the OCR pipeline and keeps the
+#                         intermediate images of the last few scans in memory for the debug page
+#######################################################################################################################
+
+import threading                        # for making traces safe to update from the region threads
+import time                             # for timing stages
+import uuid                             # for giving each trace a unique id
+from collections import deque           # for the ring buffer of recent traces
+from contextlib import contextmanager   # for timing a stage with a "with" block
+
+import numpy as np
+from PIL import Image
+
+# how many of the most recent scans keep their timings and images in memory
+TRACE_HISTORY = 20
+
+# the ring buffer of finished traces, newest first. Older traces fall off the end automatically
+_recent_traces = deque(maxlen=TRACE_HISTORY)
+_recent_traces_lock = threading.Lock()
+
+#######################################################################################################################
+# Class that records how long each stage of one scan took and the intermediate images it produced
+#######################################################################################################################
+class ScanTrace:
+    def __init__(self, label=""):
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.label = label              # usually the image's filename
+        self.started_at = time.time()
+        self.total_seconds = None       # filled in by finish_trace()
+        self.timings = []               # list of (stage name, seconds) in the order the stages finished
+        self.images = {}                # stage image name -> PIL image or numpy array
+        self.notes = {}                 # any extra facts about the scan worth showing on the debug page
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    # times the code inside a "with trace.stage(name):" block
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.timings.append((name, elapsed))
+
+    # keeps a reference to an intermediate image. Nothing is written to disk, and a numpy array (e.g. a region view)
+    # is only turned into an image if the debug page asks for it, so keeping it costs a scan nothing
+    def keep_image(self, name, img):
+        with self._lock:
+            self.images[name] = img
+
+    # keeps several images at once, e.g. the region views of a card
+    def keep_images(self, images, prefix=""):
+        for name, img in images.items():
+            self.keep_image(prefix + name, img)
+
+    # returns a kept image as a PIL image, or None if there's no image by that name
+    def image(self, name):
+        with self._lock:
+            img = self.images.get(name)
+        if img is None or isinstance(img, Image.Image):
+            return img
+        return Image.fromarray(np.ascontiguousarray(img))
+
+    def note(self, key, value):
+        with self._lock:
+            self.notes[key] = value
+
+    # returns the timings as a dictionary of stage name -> seconds (stages run more than once are summed)
+    def stage_seconds(self):
+        totals = {}
+        with self._lock:
+            for name, elapsed in self.timings:
+                totals[name] = totals.get(name, 0.0) + elapsed
+        return totals
+
+#######################################################################################################################
+# Function that starts a new trace for a scan
+# Parameters: a label to show on the debug page, usually the image's filename
+# Returns: the new ScanTrace
+#######################################################################################################################
+def start_trace(label=""):
+    return ScanTrace(label)
+
+#######################################################################################################################
+# Function that stamps a trace's total time and adds it to the ring buffer of recent scans
+# Parameters: the trace to finish
+# Returns: the same trace
+#######################################################################################################################
+def finish_trace(trace):
+    trace.total_seconds = time.perf_counter() - trace._start
+    with _recent_traces_lock:
+        _recent_traces.appendleft(trace)
+    return trace
+
+#######################################################################################################################
+# Functions for reading back recent traces
+# Returns: a list of recent traces newest first / the trace with the given id (or None if it has been dropped)
+#######################################################################################################################
+def recent_traces():
+    with _recent_traces_lock:
+        return list(_recent_traces)
+
+def get_trace(trace_id):
+    with _recent_traces_lock:
+        return next((t for t in _recent_traces if t.trace_id == trace_id), None)